@@ -0,0 +1,166 @@
+import math
+
+
+class FOPDT(object):
+    """
+    First order plus dead time boiler model:
+    tau * y' = gain * u(t - dead_time) - (y - ambient), u in % heater output.
+    Times are in seconds.
+    """
+    def __init__(self, gain=2.5, tau=300.0, dead_time=3.0, ambient=70.0):
+        self.gain = gain
+        self.tau = tau
+        self.dead_time = dead_time
+        self.ambient = ambient
+
+    @staticmethod
+    def identify(u_log, y_log, dt, max_delay=50):
+        """
+        Fit a model to logged heater output (u_log) and temperature (y_log)
+        samples taken every dt seconds. For each candidate delay d the ARX
+        model y[k+1] = a*y[k] + b*u[k-d] + c is fitted by least squares, and
+        the delay with the smallest residual wins.
+        """
+        best = None
+        for d in range(min(max_delay, len(y_log) - 4) + 1):
+            # Normal equations for (a, b, c)
+            m = [[0.0] * 4 for i in range(3)]
+            for k in range(d, len(y_log) - 1):
+                row = (y_log[k], u_log[k - d], 1.0)
+                for i in range(3):
+                    for j in range(3):
+                        m[i][j] += row[i] * row[j]
+                    m[i][3] += row[i] * y_log[k + 1]
+            solution = _solve3(m)
+            if solution is None:
+                continue
+            a, b, c = solution
+            residual = 0.0
+            for k in range(d, len(y_log) - 1):
+                e = y_log[k + 1] - (a * y_log[k] + b * u_log[k - d] + c)
+                residual += e * e
+            residual /= len(y_log) - 1 - d
+            if 0 < a < 1 and (best is None or residual < best[0]):
+                best = (residual, a, b, c, d)
+        if best is None:
+            raise ValueError("No stable model fits the log")
+        residual, a, b, c, d = best
+        return FOPDT(gain=b / (1 - a), tau=-dt / math.log(a), dead_time=d * dt, ambient=c / (1 - a))
+
+
+def _solve3(m):
+    # Gaussian elimination with partial pivoting on a 3x4 augmented matrix.
+    for col in range(3):
+        pivot = max(range(col, 3), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(3):
+            if r != col:
+                f = m[r][col] / m[col][col]
+                for c in range(col, 4):
+                    m[r][c] -= f * m[col][c]
+    return [m[i][3] / m[i][i] for i in range(3)]
+
+
+class MPCController(object):
+    """
+    Model predictive controller over a FOPDT model, usable wherever a
+    PIDController is (same update/set_temp/use_profile/set_disturbance
+    interface; profiles only carry the set point here).
+
+    Each update predicts the next `horizon` samples after the dead time:
+    the free response from the measured temperature and the inputs already
+    in flight, plus the response to holding one new output u. The u that
+    minimises the squared tracking error plus move_weight * (u - u_last)^2
+    has a closed form, so a step costs O(dead time + horizon) and never
+    more. A slowly adapted per-step bias, learned from one step prediction
+    errors, removes steady state offset from model mismatch.
+    """
+    def __init__(self, model=None, set_temp=200, period=200, horizon=25, move_weight=0.05,
+                 out_min=0, out_max=100, bias_rate=0.05):
+        self.model = model or FOPDT()
+        self.period = period
+        self.horizon = horizon
+        self.move_weight = move_weight
+        self.out_min = out_min
+        self.out_max = out_max
+        self.bias_rate = bias_rate
+        self.set_point = set_temp
+        self.profiles = {}
+        self.profile = None
+        self.disturbance = 0
+        # No PID terms here; kept so telemetry can treat both alike.
+        self.p_term = 0
+        self.i_term = 0
+        self.d_term = 0
+
+        dt = period / 1000
+        self.a = math.exp(-dt / self.model.tau)
+        self.b = self.model.gain * (1 - self.a)
+        self.c = self.model.ambient * (1 - self.a)
+        self.delay = int(round(self.model.dead_time / dt))
+        # Step response to the new input over the horizon, and its energy
+        self.step = [self.model.gain * (1 - self.a ** (k + 1)) for k in range(horizon)]
+        self.step_energy = sum(s * s for s in self.step)
+
+        # Inputs applied but not yet seen by the boiler, oldest first from pos
+        self.in_flight = [0.0] * self.delay
+        self.pos = 0
+        self.last_u = 0.0
+        self.bias = 0.0
+        self.prediction = None
+
+    def reset(self):
+        self.bias = 0.0
+        self.prediction = None
+
+    def set_temp(self, temp):
+        self.set_point = temp
+
+    def add_profile(self, name, profile):
+        self.profiles[name] = profile
+
+    def use_profile(self, name, set_temp=None):
+        if set_temp is not None:
+            self.set_temp(set_temp)
+        self.profile = name
+
+    def set_disturbance(self, value):
+        self.disturbance = value
+
+    def update(self, current_temp, dt=None):
+        a = self.a
+        b = self.b
+        if self.prediction is not None:
+            self.bias += self.bias_rate * (current_temp - self.prediction)
+        c = self.c + self.bias
+
+        # Free response through the dead time (inputs already in flight)
+        y = current_temp
+        n = self.delay
+        next_y = None
+        for k in range(n):
+            y = a * y + b * self.in_flight[(self.pos + k) % n] + c
+            if k == 0:
+                next_y = y
+        # ... and over the horizon with no new input
+        num = self.move_weight * self.last_u
+        for k in range(self.horizon):
+            y = a * y + c
+            num += self.step[k] * (self.set_point - y)
+        u = num / (self.step_energy + self.move_weight)
+        u += self.disturbance
+        if u > self.out_max:
+            u = self.out_max
+        elif u < self.out_min:
+            u = self.out_min
+
+        if n:
+            self.in_flight[self.pos] = u
+            self.pos = (self.pos + 1) % n
+        else:
+            next_y = a * current_temp + b * u + c
+        self.prediction = next_y
+        self.last_u = u
+        return u
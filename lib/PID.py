@@ -1,44 +1,436 @@
-class PIDController(object):
-    def __init__(self, p=2.0, i=0.0, d=1.0, set_temp=200, i_max=500, i_min=-500):
-        self.kp = p
-        self.ki = i
-        self.kd = d
-        self.set_point = set_temp
+import pyb
+import math
+
+# Fixed point mode works in Q8: 256 == 1.0
+FIXED_SHIFT = 8
+FIXED_ONE = 1 << FIXED_SHIFT
+# ...except ki and the integral, in Q16: boiler ki are often below 1/256
+I_SHIFT = 16
+
+
+def to_fixed(value, shift=FIXED_SHIFT):
+    return int(value * (1 << shift))
+
+
+class Profile(object):
+    """
+    A named set of gains and integral limits, e.g. for brewing or steaming.
+    """
+    def __init__(self, p=2.0, i=0.0, d=1.0, i_max=500, i_min=-500):
+        self.p = p
+        self.i = i
+        self.d = d
         self.i_max = i_max
         self.i_min = i_min
 
+
+# Starting points only; every profile begins with the stock gains.
+DEFAULT_PROFILES = {'brew': Profile(),
+                    'idle': Profile(),
+                    'warmup': Profile(),
+                    'steam': Profile()}
+
+
+class PIDController(object):
+    """
+    The gains are per nominal sample `period` (ms). Each update measures
+    the real time since the previous one with pyb.elapsed_micros (or takes
+    it as dt, in us) and scales the integral and derivative terms by it, so
+    the loop behaves the same when it runs late or early.
+
+    Switching set point or profile (use_profile) is bumpless: the integral
+    is rescaled so its contribution to the output is unchanged, and the
+    derivative history is shifted with the set point so the step causes
+    no kick. With ki == 0 nothing is integrated; switching to such a
+    profile keeps the integral's last contribution as a fixed bias, which
+    goes back into the integral on the next switch to a ki > 0 profile.
+    Call reset() to really start over.
+
+    The output is limited to out_min..out_max (the SSR's 0-100% by
+    default). While it is saturated the integral is protected from winding
+    up, either by not integrating further into the limit
+    (anti_windup='conditional') or by back-calculation with tracking gain
+    kb (anti_windup='back'); None turns this off. With d_on_measurement
+    the derivative acts on the temperature instead of the error, so set
+    point steps never kick.
+
+    With fixed=True, update() takes the temperature and returns the output
+    as Q8 ints (see to_fixed) and uses int arithmetic only, so it doesn't
+    allocate and can run from a timer ISR or micropython.schedule. There
+    ki is Q16 and the integral is kept as its contribution to the output
+    (ki * error * dt, accumulated in Q16), so small ki keep their
+    resolution. A nonzero gain too small for its Q format raises
+    ValueError.
+    """
+    def __init__(self, p=2.0, i=0.0, d=1.0, set_temp=200, i_max=500, i_min=-500, period=200, fixed=False,
+                 out_min=0, out_max=100, anti_windup='conditional', kb=1.0, d_on_measurement=False):
+        self.fixed = fixed
+        self.set_limits(out_min, out_max)
+        self.anti_windup = anti_windup
+        self.kb = kb
+        self.kb_q = to_fixed(kb)
+        self.d_on_measurement = d_on_measurement
+        self.last_temp = None
+        self.set_disturbance(0)
+        self.period = period
+        self.last_time = None
+        self.set_kp(p)
+        self.set_ki(i)
+        self.set_kd(d)
+        self._set_i_limits(i_max, i_min)
+        self.profiles = dict(DEFAULT_PROFILES)
+        self.profile = None
+
         self.dev = 0
+        # Error sum, or in fixed mode the output contribution (Q16)
         self.int = 0
+        # Integral contribution carried while ki == 0 (float mode only; the
+        # fixed point integral is a contribution already)
+        self.bias = 0
         self.error = 0
+        # Output terms of the latest update (Q8 in fixed mode), for telemetry
+        self.p_term = 0
+        self.i_term = 0
+        self.d_term = 0
+        self.set_point = set_temp
+        self.set_point_q = to_fixed(set_temp)
 
-    def set_temp(self, temp):
-        self.set_point = temp
+    def reset(self):
         self.dev = 0
         self.int = 0
+        self.bias = 0
+
+    def set_temp(self, temp):
+        # Shift the derivative history along with the set point, so the
+        # step in error doesn't show up as a derivative kick.
+        if self.fixed:
+            self.dev += to_fixed(temp) - self.set_point_q
+        else:
+            self.dev += temp - self.set_point
+        self.set_point = temp
+        self.set_point_q = to_fixed(temp)
+
+    def add_profile(self, name, profile):
+        self.profiles[name] = profile
+
+    def use_profile(self, name, set_temp=None):
+        """
+        Switch to the named profile's gains and limits (and optionally a new
+        set point) without resetting the accumulated state.
+        """
+        if set_temp is not None and set_temp != self.set_point:
+            self.set_temp(set_temp)
+        if name == self.profile:
+            return
+        profile = self.profiles[name]
+        old_ki = self.ki_q if self.fixed else self.ki
+        self.set_kp(profile.p)
+        self.set_ki(profile.i)
+        self.set_kd(profile.d)
+        new_ki = self.ki_q if self.fixed else self.ki
+        # Keep ki * int + bias unchanged across the gain change.
+        if new_ki != old_ki and not self.fixed:
+            carried = old_ki * self.int + self.bias
+            if new_ki:
+                self.int = carried / new_ki
+                self.bias = 0
+            else:
+                self.int = 0
+                self.bias = carried
+        self._set_i_limits(profile.i_max, profile.i_min)
+        # With ki == 0 (fixed mode) the limits are 0; the contribution stays.
+        if not self.fixed or new_ki:
+            limit_max = self.i_max_q if self.fixed else self.i_max
+            limit_min = self.i_min_q if self.fixed else self.i_min
+            if self.int > limit_max:
+                self.int = limit_max
+            elif self.int < limit_min:
+                self.int = limit_min
+        self.profile = name
+
+    def _set_i_limits(self, i_max, i_min):
+        # i_max/i_min bound the error sum; in fixed mode they apply to the
+        # contribution, ki * i_max (Q16).
+        self.i_max = i_max
+        self.i_min = i_min
+        self.i_max_q = (self.ki_q * to_fixed(i_max)) >> FIXED_SHIFT
+        self.i_min_q = (self.ki_q * to_fixed(i_min)) >> FIXED_SHIFT
+
+    def _quantise(self, gain, shift=FIXED_SHIFT):
+        value = to_fixed(gain, shift)
+        if self.fixed and gain and not value:
+            raise ValueError("Gain %r is below the fixed point resolution" % gain)
+        return value
 
     def set_kp(self, kp):
         self.kp = kp
+        self.kp_q = self._quantise(kp)
 
     def set_ki(self, ki):
         self.ki = ki
+        self.ki_q = self._quantise(ki, I_SHIFT)
 
     def set_kd(self, kd):
         self.kd = kd
+        self.kd_q = self._quantise(kd)
 
-    def update(self, current_temp):
+    def _elapsed(self):
+        if self.last_time is None:
+            dt = self.period * 1000
+        else:
+            dt = pyb.elapsed_micros(self.last_time)
+        self.last_time = pyb.micros()
+        return dt
+
+    def set_disturbance(self, value):
+        """
+        Additive feed-forward input (output units), e.g. to counter a known
+        load before the sensor sees its effect. Subject to the output limits.
+        """
+        self.disturbance = value
+        self.disturbance_q = to_fixed(value)
+
+    def set_limits(self, out_min, out_max):
+        self.out_min = out_min
+        self.out_max = out_max
+        self.out_min_q = to_fixed(out_min)
+        self.out_max_q = to_fixed(out_max)
+
+    def update(self, current_temp, dt=None):
+        if dt is None:
+            dt = self._elapsed()
+        if self.fixed:
+            return self._update_fixed(current_temp, dt)
+
+        # At least 1 ms, as in _update_fixed: dt divides the D term.
+        if dt < 1000:
+            dt = 1000
+        scale = dt / (self.period * 1000)
         self.error = self.set_point - current_temp
         p_value = self.kp * self.error
-        d_value = self.kd * (self.error - self.dev)
+        if self.d_on_measurement:
+            last = current_temp if self.last_temp is None else self.last_temp
+            d_value = -self.kd * (current_temp - last) / scale
+        else:
+            d_value = self.kd * (self.error - self.dev) / scale
         self.dev = self.error
-        self.int = self.int + self.error
+        self.last_temp = current_temp
+
+        integral = self.int + self.error * scale if self.ki else self.int
+        if integral > self.i_max:
+            integral = self.i_max
+        elif integral < self.i_min:
+            integral = self.i_min
+
+        i_value = integral * self.ki + self.bias
+        output = p_value + i_value + d_value + self.disturbance
+        self.p_term = p_value
+        self.i_term = i_value
+        self.d_term = d_value
+        limited = output
+        if limited > self.out_max:
+            limited = self.out_max
+        elif limited < self.out_min:
+            limited = self.out_min
+
+        if limited != output:
+            if self.anti_windup == 'back':
+                # Back-calculation: bleed the integral towards the value
+                # that would just reach the limit.
+                if self.ki:
+                    integral += self.kb * scale * (limited - output) / self.ki
+            elif self.anti_windup and (output > limited) == (self.error > 0):
+                # Conditional integration: don't integrate further into
+                # the saturation.
+                integral = self.int
+        self.int = integral
+        return limited
+
+    def _update_fixed(self, current_temp, dt):
+        # All values are Q8 ints; times are whole ms so products stay small ints.
+        dt_ms = dt // 1000
+        if dt_ms < 1:
+            dt_ms = 1
+        error = self.set_point_q - current_temp
+        p_value = (self.kp_q * error) >> FIXED_SHIFT
+        if self.d_on_measurement:
+            last = current_temp if self.last_temp is None else self.last_temp
+            d_value = -((self.kd_q * (current_temp - last)) >> FIXED_SHIFT) * self.period // dt_ms
+        else:
+            d_value = ((self.kd_q * (error - self.dev)) >> FIXED_SHIFT) * self.period // dt_ms
+        self.dev = error
+        self.error = error
+        self.last_temp = current_temp
+
+        integral = self.int
+        ki_q = self.ki_q
+        if ki_q:
+            # ki * error * dt in Q16, with ki_q split in two so the products
+            # stay small ints.
+            scaled = error * dt_ms // self.period
+            integral += (ki_q >> FIXED_SHIFT) * scaled + (((ki_q & 0xFF) * scaled) >> FIXED_SHIFT)
+            if integral > self.i_max_q:
+                integral = self.i_max_q
+            elif integral < self.i_min_q:
+                integral = self.i_min_q
+
+        i_value = integral >> (I_SHIFT - FIXED_SHIFT)
+        output = p_value + i_value + d_value + self.disturbance_q
+        self.p_term = p_value
+        self.i_term = i_value
+        self.d_term = d_value
+        limited = output
+        if limited > self.out_max_q:
+            limited = self.out_max_q
+        elif limited < self.out_min_q:
+            limited = self.out_min_q
+
+        if limited != output:
+            if self.anti_windup == 'back':
+                if ki_q:
+                    integral += (((self.kb_q * (limited - output)) >> FIXED_SHIFT) * dt_ms // self.period) \
+                        << (I_SHIFT - FIXED_SHIFT)
+            elif self.anti_windup and (output > limited) == (error > 0):
+                integral = self.int
+        self.int = integral
+        return limited
+
+
+class ShotFeedForward(object):
+    """
+    Heater boost for the thermal load of a shot. Cold water enters the
+    boiler the moment the pump starts, seconds before the sensor shows it,
+    so `boost` (% output) is applied from shot start and fades out linearly
+    over `duration` ms.
+
+    With learn_rate set, the boost adapts after every shot: the deepest
+    dip below the set point during the shot raises it, a rise above the set
+    point lowers it.
+    """
+    def __init__(self, boost=30, duration=25000, learn_rate=0.5, max_boost=100):
+        self.boost = boost
+        self.duration = duration
+        self.learn_rate = learn_rate
+        self.max_boost = max_boost
+        self.running = False
+        self.start_time = 0
+        self.dip = 0
+        self.rise = 0
+
+    def start(self):
+        self.running = True
+        self.start_time = pyb.millis()
+        self.dip = 0
+        self.rise = 0
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self.learn_rate:
+            boost = self.boost + self.learn_rate * (self.dip - self.rise)
+            self.boost = min(max(boost, 0), self.max_boost)
+
+    def value(self, error):
+        """
+        Return the feed-forward output for the current set point error.
+        """
+        if not self.running:
+            return 0
+        if error > self.dip:
+            self.dip = error
+        elif -error > self.rise:
+            self.rise = -error
+        elapsed = pyb.elapsed_millis(self.start_time)
+        if elapsed >= self.duration:
+            return 0
+        return self.boost * (self.duration - elapsed) / self.duration
+
+
+class RelayAutotune(object):
+    """
+    Relay feedback (Astrom-Hagglund) autotuner. While running it replaces
+    the PID: the heater is switched between `high` and `low` around the set
+    point (with hysteresis), which makes the boiler temperature oscillate
+    at the loop's ultimate period Pu with an amplitude a. The ultimate gain
+    follows as Ku = 4d / (pi a), d being half the relay swing.
+
+    Gains use the Tyreus-Luyben rules, which overshoot less than
+    Ziegler-Nichols on slow thermal loads, and are returned per nominal
+    sample period like PIDController's.
+
+    A boiler that never oscillates (e.g. it can't reach set_point +
+    hysteresis) would keep the relay going forever; after `max_duration`
+    ms without enough cycles the tune has `expired` and should be given up.
+    """
+    def __init__(self, set_temp, high=100, low=0, hysteresis=1.0, cycles=5, max_duration=3600000):
+        self.set_point = set_temp
+        self.high = high
+        self.low = low
+        self.hysteresis = hysteresis
+        self.cycles = cycles
+        self.max_duration = max_duration
+        self.start_time = pyb.millis()
+
+        self.output = high
+        self.temp_max = None
+        self.temp_min = None
+        self.last_rise = None
+        self.amplitudes = []
+        self.periods = []
+
+    @property
+    def done(self):
+        return len(self.periods) >= self.cycles
+
+    @property
+    def expired(self):
+        return not self.done and pyb.elapsed_millis(self.start_time) > self.max_duration
+
+    @property
+    def progress(self):
+        """
+        Percentage of the oscillation cycles measured so far.
+        """
+        return min(len(self.periods), self.cycles) * 100 // self.cycles
+
+    def update(self, current_temp):
+        if self.temp_max is None or current_temp > self.temp_max:
+            self.temp_max = current_temp
+        if self.temp_min is None or current_temp < self.temp_min:
+            self.temp_min = current_temp
 
-        if self.int > self.i_max:
-            self.int = self.i_max
-        elif self.int < self.i_min:
-            self.int = self.i_min
+        if self.output == self.high and current_temp > self.set_point + self.hysteresis:
+            self.output = self.low
+        elif self.output == self.low and current_temp < self.set_point - self.hysteresis:
+            self.output = self.high
+            # One full cycle per switch back on
+            if self.last_rise is not None:
+                self.periods.append(pyb.elapsed_millis(self.last_rise))
+                self.amplitudes.append((self.temp_max - self.temp_min) / 2)
+            self.last_rise = pyb.millis()
+            self.temp_max = current_temp
+            self.temp_min = current_temp
+        return self.output
 
-        i_value = self.int * self.ki
+    def ultimate(self):
+        """
+        Return the ultimate gain and period (ms), ignoring the first cycle
+        which still carries the start-up transient.
+        """
+        periods = self.periods[1:] or self.periods
+        amplitudes = self.amplitudes[1:] or self.amplitudes
+        pu = sum(periods) / len(periods)
+        a = sum(amplitudes) / len(amplitudes)
+        ku = 4 * ((self.high - self.low) / 2) / (math.pi * a)
+        return ku, pu
 
-        output = p_value + i_value + d_value
-        print(self.set_point)
-        return output
+    def gains(self, period=200):
+        """
+        Return (kp, ki, kd) for a PIDController sampling every `period` ms.
+        """
+        ku, pu = self.ultimate()
+        kp = ku / 2.2
+        ti = 2.2 * pu / period
+        td = pu / 6.3 / period
+        return kp, kp / ti, kp * td
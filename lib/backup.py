@@ -0,0 +1,102 @@
+"""
+Fast copy of the settings in the STM32 RTC backup registers.
+
+The 20 backup registers (80 bytes) keep their contents through resets,
+and through power off as long as VBAT is backed by a battery or supercap.
+Reading or writing them takes microseconds, so the settings are available
+at boot before the SD card is even mounted:
+
+>>> backup = BackupSettings(('set_temp', 'steam_temp'), ('brew', 'steam'))
+>>> backup.save(state, pid.profiles, tuned=['brew'])
+>>> backup.load()
+({'set_temp': 200, 'steam_temp': 240}, {'brew': (2.0, 0.1, 1.0)})
+
+The record is a magic byte, a bit mask of the profiles with saved gains,
+one int16 per setting key and kp, ki, kd as floats per profile, followed
+by its CRC8. load() returns None if the record is missing or damaged
+(first power up, or the backup domain lost power).
+"""
+
+import pyb
+import stm
+import struct
+from Espyresso.lib.onewire import crc8
+
+MAGIC = 0x5E
+REGISTERS = 20
+
+
+class BackupRAM(object):
+    """
+    The RTC backup registers as a 32 bit word store.
+    """
+    def __init__(self):
+        # The registers live in the RTC's backup domain: make sure it is
+        # initialised, and allow writes to it (PWR_CR DBP).
+        pyb.RTC()
+        stm.mem32[stm.PWR + stm.PWR_CR] |= 1 << 8
+
+    def read_into(self, buf):
+        for i in range(len(buf) // 4):
+            struct.pack_into('<I', buf, i * 4, stm.mem32[stm.RTC + stm.RTC_BKP0R + i * 4] & 0xFFFFFFFF)
+
+    def write(self, buf):
+        for i in range(len(buf) // 4):
+            stm.mem32[stm.RTC + stm.RTC_BKP0R + i * 4] = struct.unpack_from('<I', buf, i * 4)[0]
+
+
+class BackupSettings(object):
+    def __init__(self, keys, profiles, ram=None):
+        self.keys = keys
+        self.profiles = profiles
+        self.format = '<BB' + 'h' * len(keys) + 'fff' * len(profiles)
+        size = struct.calcsize(self.format) + 1
+        # Whole registers; the CRC byte comes last.
+        self.buf = bytearray((size + 3) & ~3)
+        if len(self.buf) > REGISTERS * 4:
+            raise ValueError("Settings don't fit in the backup registers")
+        self.ram = ram or BackupRAM()
+
+    def save(self, values, profiles, tuned=()):
+        """
+        Store the setting `values` (indexable by key), and the gains of
+        the `tuned` profiles, taken from the `profiles` dict.
+        """
+        mask = 0
+        gains = []
+        for i, name in enumerate(self.profiles):
+            profile = profiles.get(name)
+            if name in tuned and profile is not None:
+                mask |= 1 << i
+                gains.extend((profile.p, profile.i, profile.d))
+            else:
+                gains.extend((0.0, 0.0, 0.0))
+        buf = self.buf
+        struct.pack_into(self.format, buf, 0, MAGIC, mask, *([int(values[key]) for key in self.keys] + gains))
+        buf[-1] = crc8(memoryview(buf)[:-1])
+        self.ram.write(buf)
+
+    def load(self):
+        """
+        Return (settings, gains): a dict of the settings and a dict of
+        profile name to (kp, ki, kd) for the saved gains. None if there is
+        no valid copy.
+        """
+        buf = self.buf
+        self.ram.read_into(buf)
+        if buf[0] != MAGIC or crc8(buf) != 0:
+            return None
+        fields = struct.unpack_from(self.format, buf, 0)
+        mask = fields[1]
+        n = len(self.keys)
+        settings = dict(zip(self.keys, fields[2:2 + n]))
+        gains = {}
+        for i, name in enumerate(self.profiles):
+            if mask & (1 << i):
+                gains[name] = fields[2 + n + i * 3:5 + n + i * 3]
+        return settings, gains
+
+    def clear(self):
+        for i in range(len(self.buf)):
+            self.buf[i] = 0
+        self.ram.write(self.buf)
@@ -16,12 +16,32 @@ Y11, vcc is connected to Y9 and the data pin is connected to Y10.
 >>> from ds18x20 import DS18X20
 >>> d = DS18X20(Pin('Y10'))
 
+The bus is bit-banged on the pin by default. To run it from a spare UART
+(TX/RX tied to the bus through an open-drain buffer) pass a backend:
+
+>>> from onewire import UARTBackend
+>>> d = DS18X20(Pin('Y10'), UARTBackend(4))
+
+Pass a cache path to skip the bus search at boot. Known ROMs are read from
+the file and checked with one Match ROM each; the bus is only searched
+again if one of them is missing (or when rescan is called):
+
+>>> d = DS18X20(Pin('Y10'), cache='/sd/dat/roms.dat')
+
 Call read_temps to read all sensors:
 
 >>> result = d.read_temps()
 >>> print(result)
 [20.875, 20.8125]
 
+All sensors convert at once, so this costs about one conversion time.
+The same is available without blocking:
+
+>>> d.start_conversions()
+>>> while not d.is_ready():
+...     do_other_work()
+>>> result = d.read_results()
+
 Call read_temp to read the temperature of a specific sensor:
 
 >>> result = d.read_temp(d.roms[0])
@@ -35,36 +55,284 @@ pass a ROM to read_temp:
 >>> print(result)
 20.25
 
+read_temp blocks for the whole conversion (up to 750ms). To keep a loop
+running while the sensor converts, split the read up instead:
+
+>>> d.start_conversion()
+>>> while not d.is_ready():
+...     do_other_work()
+>>> result = d.read_result()
+
+or call poll() once per loop; it returns None until a new reading is in,
+and starts the next conversion as soon as one is read:
+
+>>> result = d.poll()
+
+DS18B20 devices power up at 12 bit resolution (750ms per conversion).
+Lower resolutions convert faster:
+
+>>> d.set_resolution(10)  # 0.25C steps, 187.5ms per conversion
+
+With adaptive sampling, poll switches between fast_resolution and
+idle_resolution before starting its next conversion:
+
+>>> d.set_fast(True)
+
+To sample from a timer instead, hand it a pyb.Timer and read d.temp:
+
+>>> d.start_sampling(pyb.Timer(4, freq=10))
+>>> print(d.temp)
+20.25
+
 """
 
-from Espyresso.lib.onewire import OneWire
+import pyb
+import micropython
+from Espyresso.lib.onewire import OneWire, crc8
+
+# DS18B20 configuration register values and worst case conversion times (ms)
+# per resolution in bits.
+RESOLUTION_CONFIG = {9: 0x1F, 10: 0x3F, 11: 0x5F, 12: 0x7F}
+CONVERSION_TIME = {9: 94, 10: 188, 11: 375, 12: 750}
+
+# Family codes of the DS18S20 and DS18B20
+FAMILIES = (0x10, 0x28)
 
 class DS18X20(object):
-    def __init__(self, pin):
-        self.ow = OneWire(pin)
-        # Scan the 1-wire devices, but only keep those which have the
-        # correct # first byte in their rom for a DS18x20 device.
-        self.roms = [rom for rom in self.ow.scan() if rom[0] == 0x10 or rom[0] == 0x28]
+    def __init__(self, pin, backend=None, cache=None):
+        self.ow = OneWire(pin, backend)
+        self.cache = cache
+        self.roms = self._load_roms() if cache else []
+        if not self.roms:
+            self.rescan()
+        # Conversion in progress, and the latest reading (celsius)
+        self.converting = False
+        self.temp = None
+        self.sample_rom = None
+        # Bound once so the timer ISR doesn't allocate a new method object.
+        self._sample_ref = self._sample
+        # Resolution (bits) of each device, and the adaptive sampling targets
+        self.resolutions = {}
+        self.fast_resolution = 10
+        self.idle_resolution = 12
+        self.target_resolution = None
+        self.conversion_start = 0
+        self.conversion_time = CONVERSION_TIME[12]
+        # Scratchpad reads retried per CRC mismatch; mismatches seen, and
+        # reads that still failed after all retries
+        self.retries = 3
+        self.crc_errors = 0
+        self.read_errors = 0
 
-    def read_temp(self, rom=None):
+    def rescan(self):
         """
-        Read and return the temperature of one DS18x20 device.
-        Pass the 8-byte bytes object with the ROM of the specific device you want to read.
-        If only one DS18x20 device is attached to the bus you may omit the rom parameter.
+        Search the bus for DS18x20 devices, only following their family codes,
+        and update the ROM cache file if there is one.
+        """
+        roms = []
+        for family in FAMILIES:
+            roms.extend(self.ow.scan(family))
+        self.roms = roms
+        if self.cache:
+            self._save_roms()
+
+    def _load_roms(self):
+        """
+        Return the cached ROMs if every one of them is still on the bus,
+        otherwise an empty list.
+        """
+        try:
+            with open(self.cache, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return []
+        roms = []
+        for i in range(0, len(data) - 7, 8):
+            rom = data[i:i + 8]
+            if crc8(rom) != 0 or rom[0] not in FAMILIES or not self.ow.verify(rom):
+                return []
+            roms.append(rom)
+        return roms
+
+    def _save_roms(self):
+        try:
+            with open(self.cache, 'wb') as file:
+                for rom in self.roms:
+                    file.write(rom)
+        except OSError:
+            pass  # no storage; we'll just search again next boot
+
+    def read_scratch(self, rom):
+        """
+        Read and CRC check the 9 byte scratchpad of a device. Reading is
+        non-destructive, so a mismatch is simply read again.
+        """
+        ow = self.ow
+        for attempt in range(self.retries + 1):
+            ow.reset()
+            ow.select_rom(rom)
+            ow.write_byte(0xbe)  # Read scratch
+            data = ow.read_bytes(9)
+            if crc8(data) == 0:
+                return data
+            self.crc_errors += 1
+        self.read_errors += 1
+        raise OSError("DS18x20 scratchpad CRC mismatch")
+
+    def set_resolution(self, bits, rom=None, persist=False):
+        """
+        Set the resolution (9 to 12 bits) of one device, or of all DS18B20
+        devices if rom is omitted. DS18S20 devices are fixed and skipped.
+        Pass persist=True to also copy the setting to the device EEPROM;
+        avoid that for frequent switching as the EEPROM wears.
+        """
+        config = RESOLUTION_CONFIG[bits]
+        ow = self.ow
+        for rom in ([rom] if rom else self.roms):
+            if rom[0] != 0x28:
+                continue
+            data = self.read_scratch(rom)
+            ow.reset()
+            ow.select_rom(rom)
+            ow.write_byte(0x4e)  # Write scratch: TH, TL, config
+            ow.write_bytes(bytes((data[2], data[3], config)))
+            if persist:
+                ow.reset()
+                ow.select_rom(rom)
+                ow.write_byte(0x48)  # Copy scratch to EEPROM
+                pyb.delay(10)
+            self.resolutions[bytes(rom)] = bits
+
+    def resolution(self, rom=None):
+        rom = rom or self.roms[0]
+        if rom[0] != 0x28:
+            return 9
+        return self.resolutions.get(bytes(rom), 12)
+
+    def set_fast(self, fast):
+        """
+        Adaptive sampling: use fast_resolution when fast is set, and
+        idle_resolution otherwise. Applied by poll before its next conversion.
+        """
+        self.target_resolution = self.fast_resolution if fast else self.idle_resolution
+
+    def start_conversion(self, rom=None):
+        """
+        Issue Convert T to one DS18x20 device and return immediately.
         """
         rom = rom or self.roms[0]
         ow = self.ow
         ow.reset()
         ow.select_rom(rom)
         ow.write_byte(0x44)  # Convert Temp
-        while True:
-            if ow.read_bit():
-                break
+        self.converting = True
+        self.conversion_start = pyb.millis()
+        self.conversion_time = CONVERSION_TIME[12] if rom[0] == 0x10 else CONVERSION_TIME[self.resolution(rom)]
+
+    def start_conversions(self):
+        """
+        Issue a single Convert T to every device on the bus at once (Skip ROM).
+        Does nothing when no device was found.
+        """
+        if not self.roms:
+            return
+        ow = self.ow
         ow.reset()
-        ow.select_rom(rom)
-        ow.write_byte(0xbe)  # Read scratch
-        data = ow.read_bytes(9)
-        return self.convert_temp(rom[0], data)
+        ow.skip_rom()
+        ow.write_byte(0x44)  # Convert Temp
+        self.converting = True
+        self.conversion_start = pyb.millis()
+        self.conversion_time = max([CONVERSION_TIME[12] if rom[0] == 0x10 else CONVERSION_TIME[self.resolution(rom)]
+                                    for rom in self.roms])
+
+    def read_results(self):
+        """
+        Read every device's scratchpad after start_conversions has finished
+        and return the temperatures in celsius, in the order of self.roms.
+        """
+        self.converting = False
+        return [self.convert_temp(rom[0], self.read_scratch(rom)) for rom in self.roms]
+
+    def is_ready(self):
+        """
+        Return True once the conversion started by start_conversion has finished.
+        The bus is only checked once the conversion time for the device's
+        resolution is nearly up; the device holds it low while converting.
+        """
+        if not self.converting:
+            return False
+        if pyb.elapsed_millis(self.conversion_start) < self.conversion_time - 10:
+            return False
+        return bool(self.ow.read_bit())
+
+    def read_result(self, rom=None):
+        """
+        Read the scratchpad of a device whose conversion has finished and
+        return the temperature in celsius.
+        """
+        rom = rom or self.roms[0]
+        self.converting = False
+        data = self.read_scratch(rom)
+        self.temp = self.convert_temp(rom[0], data)
+        return self.temp
+
+    def poll(self, rom=None):
+        """
+        Drive continuous conversions without blocking. Returns the new
+        temperature in celsius when one has just been read, None otherwise.
+        """
+        if not self.converting:
+            self._apply_target(rom)
+            self.start_conversion(rom)
+            return None
+        if not self.is_ready():
+            return None
+        temp = self.read_result(rom)
+        self._apply_target(rom)
+        self.start_conversion(rom)
+        return temp
+
+    def _apply_target(self, rom):
+        target = self.target_resolution
+        if target and target != self.resolution(rom):
+            self.set_resolution(target, rom)
+
+    def poll_f(self, rom=None):
+        """
+        Like poll, but the temperature is returned in Fahrenheit.
+        """
+        temp = self.poll(rom)
+        return None if temp is None else ((temp * 1.8) + 32)
+
+    def start_sampling(self, timer, rom=None):
+        """
+        Sample continuously from a pyb.Timer; the latest reading is kept in
+        self.temp. The bus work is deferred out of the ISR with
+        micropython.schedule, so don't use the bus from the main loop too.
+        """
+        self.sample_rom = rom
+        timer.callback(self._tick)
+
+    def _tick(self, timer):
+        try:
+            micropython.schedule(self._sample_ref, None)
+        except RuntimeError:
+            pass  # schedule queue full, try again on the next tick
+
+    def _sample(self, _):
+        self.poll(self.sample_rom)
+
+    def read_temp(self, rom=None):
+        """
+        Read and return the temperature of one DS18x20 device.
+        Pass the 8-byte bytes object with the ROM of the specific device you want to read.
+        If only one DS18x20 device is attached to the bus you may omit the rom parameter.
+        """
+        self.start_conversion(rom)
+        pyb.delay(self.conversion_time - 10)
+        while not self.is_ready():
+            pass
+        return self.read_result(rom)
 
     def read_temp_f(self, rom=None):
         """
@@ -72,16 +340,21 @@ class DS18X20(object):
         Pass the 8-byte bytes object with the ROM of the specific device you want to read.
         If only one DS18x20 device is attached to the bus you may omit the rom parameter.
         """
-        return ((self.read_temp(None) * 1.8) + 32)
+        return ((self.read_temp(rom) * 1.8) + 32)
 
     def read_temps(self):
         """
         Read and return the temperatures of all attached DS18x20 devices.
+        All devices convert together, so this takes one conversion time
+        rather than one per device.
         """
-        temps = []
-        for rom in self.roms:
-            temps.append(self.read_temp(rom))
-        return temps
+        if not self.roms:
+            return []
+        self.start_conversions()
+        pyb.delay(self.conversion_time - 10)
+        while not self.is_ready():
+            pass
+        return self.read_results()
 
     def convert_temp(self, rom0, data):
         """
@@ -101,6 +374,8 @@ class DS18X20(object):
             temp = temp_read - 0.25 + (count_per_c - count_remain) / count_per_c
             return temp
         elif rom0 == 0x28:
+            # bits below the configured resolution are undefined
+            temp_lsb &= ~((1 << (3 - ((data[4] >> 5) & 3))) - 1)
             temp = (temp_msb << 8 | temp_lsb) / 16
             if (temp_msb & 0xf8) == 0xf8: # for negative temperature
                 temp -= 0x1000
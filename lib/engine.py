@@ -1,21 +1,67 @@
 import pyb
 import micropython
 import Espyresso.lib.onewire
-from Espyresso.lib.PID import PIDController
-from Espyresso.lib.ds18x20 import DS18X20
+from Espyresso.lib.PID import PIDController, Profile, RelayAutotune, ShotFeedForward
+from Espyresso.lib.MPC import MPCController
+from Espyresso.lib.ds18x20 import DS18X20, CONVERSION_TIME
+from Espyresso.lib.scheduler import Scheduler
+from Espyresso.lib.settings import SettingsLog
+from Espyresso.lib.backup import BackupSettings
+from Espyresso.lib.telemetry import FLAG_SHOT, FLAG_STEAM, FLAG_AUTOTUNE, FLAG_NO_SENSOR, NAN
+
+# Task periods (ms); tasks with lower priority numbers run first when due
+# together.
+SENSOR_PERIOD = 50
+PID_PERIOD = 200
+INPUT_PERIOD = 50
+DISPLAY_PERIOD = 100
+SETTINGS_PERIOD = 1000
+
+# Below the set point by more than this, the warm-up profile is used.
+WARMUP_BAND = 20
+
+# The heater is kept off when the last good reading is older than this (ms)
+# or there hasn't been one yet: a few of the slowest conversions.
+SENSOR_TIMEOUT = 4 * CONVERSION_TIME[12]
 
 
 # Formatting
 def format_temp(value, precision=0):
+    if isinstance(value, str):
+        return value
     return str(round(value, precision)) + chr(247)
 
 
 # Sensors/Sensor functions
-def get_temp(sensor):
+# Non-blocking: returns `last` until the sensor finishes its next conversion,
+# or when a reading fails its CRC checks. With fast set, the sensor drops to
+# its fast (lower) resolution.
+def get_temp(sensor, last, fast=False):
     try:
-        return sensor.read_temp_f()
+        sensor.set_fast(fast)
+        temp = sensor.poll_f()
     except IndexError:
         return "No Sensor"
+    except OSError:
+        return last
+    return last if temp is None else temp
+
+
+# Control profile for the current machine state
+def select_profile(state, temp):
+    if not state.mode:
+        return 'steam'
+    if state.set_temp - temp > WARMUP_BAND:
+        return 'warmup'
+    return 'brew' if state.state else 'idle'
+
+
+# Control strategy named by state.strategy: 'pid' (default) or 'mpc'.
+# An MPC uses state.model (an MPC.FOPDT) if given.
+def make_strategy(state):
+    if state.get('strategy') == 'mpc':
+        return MPCController(model=state.get('model'), set_temp=state.set_temp, period=PID_PERIOD)
+    return PIDController(set_temp=state.set_temp, period=PID_PERIOD, d_on_measurement=True)
 
 
 # Debounce logic
@@ -27,10 +73,10 @@ def debounce(last, wait):
 def adjust_set_up(p):
     global last_up, temp_changed
     if debounce(last_up, 200):
-        if state['mode']:
-            state['set_temp'] = state['set_temp'] + 1
+        if state.mode:
+            state.set_temp = state.set_temp + 1
         else:
-            state['steam_temp'] = state['steam_temp'] + 1
+            state.steam_temp = state.steam_temp + 1
         last_up = pyb.millis()
         temp_changed = True
 
@@ -38,41 +84,54 @@ def adjust_set_up(p):
 def adjust_set_down(p):
     global last_down, temp_changed
     if debounce(last_down, 200):
-        if state['mode']:
-            state['set_temp'] = state['set_temp'] - 1
+        if state.mode:
+            state.set_temp = state.set_temp - 1
         else:
-            state['steam_temp'] = state['steam_temp'] - 1
+            state.steam_temp = state.steam_temp - 1
         last_down = pyb.millis()
         temp_changed = True
 
 
+# Settings saved on every change: at once to the RTC backup registers (see
+# backup.py), and a little later to the SD card (see settings.py).
+SETTINGS_KEYS = ('set_temp', 'steam_temp')
+GAIN_PROFILES = ('brew', 'idle', 'warmup', 'steam')
+settings_log = SettingsLog('/sd/dat/settings.log', SETTINGS_KEYS)
+
+
 def save_settings():
-    global temp_changed, last_saved
-    if temp_changed:
-        settings_file = open('/sd/dat/settings.dat', 'w')
-        save_setting(settings_file, "set_temp")
-        save_setting(settings_file, "steam_temp")
-        settings_file.close()
-        temp_changed = False
+    global sd_stale, last_saved
+    if sd_stale:
+        try:
+            settings_log.append(state)
+        except OSError:
+            return  # no storage; try again on the next change check
+        sd_stale = False
         last_saved = pyb.millis()
         print("Settings saved")
 
 
-# Assumes that the given file is open
-def save_setting(file, key):
-    file.write(key + " " + str(state[key]) + "\n")
+def restore_settings():
+    settings = settings_log.load()
+    if settings is None:
+        restore_legacy_settings()
+        return
+    for key in settings:
+        state[key] = settings[key]
 
 
-def restore_settings():
-    with open('/sd/dat/settings.dat', 'r') as file:
-        settings = [line.strip('\n') for line in file.readlines()]
+# Text settings.dat of older versions, one "key value" line per setting;
+# only read when there is no settings log yet.
+def restore_legacy_settings():
+    try:
+        with open('/sd/dat/settings.dat', 'r') as file:
+            settings = [line.strip('\n') for line in file.readlines()]
+    except OSError:
+        return
 
     for prop in settings:
-        print("\tLoading property: " + prop)
         restore_setting(prop)
 
-    return
-
 
 def restore_setting(prop):
     pair = prop.split()
@@ -81,6 +140,36 @@ def restore_setting(prop):
     return
 
 
+# Tuned gains, one line per profile: name kp ki kd
+def save_gains(pid, names):
+    with open('/sd/dat/gains.dat', 'w') as file:
+        for name in names:
+            profile = pid.profiles[name]
+            file.write(name + " " + str(profile.p) + " " + str(profile.i) + " " + str(profile.d) + "\n")
+    print("Gains saved")
+
+
+def restore_gains(pid):
+    names = []
+    try:
+        with open('/sd/dat/gains.dat', 'r') as file:
+            lines = file.readlines()
+    except OSError:
+        return names
+    for line in lines:
+        fields = line.split()
+        if len(fields) == 4:
+            set_gains(pid, fields[0], float(fields[1]), float(fields[2]), float(fields[3]))
+            names.append(fields[0])
+    return names
+
+
+# Replace a profile's gains, keeping its integral limits
+def set_gains(pid, name, p, i, d):
+    base = pid.profiles.get(name) or Profile()
+    pid.add_profile(name, Profile(p, i, d, base.i_max, base.i_min))
+
+
 # Primitives:
 class Point(object):
     def __init__(self, x, y, fill):
@@ -94,20 +183,64 @@ class Point(object):
     def translate(self, x, y):
         return Point(x + self.x, y + self.y, self.fill)
 
+    def bounds(self):
+        return self.x, self.y, 1, 1
+
+    def __eq__(self, other):
+        return (isinstance(other, Point) and self.x == other.x and self.y == other.y
+                and self.fill == other.fill)
+
 
 class Text(object):
-    def __init__(self, x, y, string, size=1, space=1):
+    def __init__(self, x, y, string, size=1, space=1, font=None):
         self.x = x
         self.y = y
         self.string = string
         self.size = size
         self.space = space
+        self.font = font
+
+    def draw(self, display):
+        display.draw_text(self.x, self.y, self.string, self.size, self.space, self.font)
+
+    def translate(self, x, y):
+        return Text(x + self.x, y + self.y, self.string, self.size, self.space, self.font)
+
+    def bounds(self):
+        cols = self.font.cols if self.font else 5
+        rows = self.font.pages * 8 if self.font else 8
+        return self.x, self.y, len(self.string) * (cols * self.size + self.space), rows * self.size
+
+    def __eq__(self, other):
+        return (isinstance(other, Text) and self.x == other.x and self.y == other.y
+                and self.string == other.string and self.size == other.size
+                and self.space == other.space and self.font is other.font)
+
+
+class Background(object):
+    def __init__(self, name, layer):
+        self.name = name
+        self.layer = layer
 
     def draw(self, display):
-        display.draw_text(self.x, self.y, self.string, self.size, self.space)
+        display.use_background(self.name, self.layer)
 
     def translate(self, x, y):
-        return Text(x + self.x, y + self.y, self.string, self.size, self.space)
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, Background) and self.name == other.name
+
+
+# Bounds are widened to whole display pages, the unit the display restores in.
+def page_bounds(bounds):
+    x, y, w, h = bounds
+    top = y & ~7
+    return x, top, w, ((y + h + 7) & ~7) - top
+
+
+def overlaps(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
 
 
 def relative(fn):
@@ -130,15 +263,60 @@ def point(x, y, fill):
     yield Point(x, y, fill)
 
 
-def text(x, y, string, size=1, space=1):
-    yield Text(x, y, string, size, space)
+def text(x, y, string, size=1, space=1, font=None):
+    yield Text(x, y, string, size, space, font)
+
+
+# Static layer rendered once and cached by name; yield it before anything else.
+def background(name, layer):
+    yield Background(name, layer)
+
+
+class MachineState(object):
+    """
+    The machine state, allocated once and mutated in place by the tasks, so
+    handling it never allocates. Fields are attributes (state.boiler_temp);
+    state['boiler_temp'], get() and update() are kept so views and
+    controllers written against the old state dict still work.
+    `display` is a dict with the display's width and height, built once.
+    """
+    __slots__ = ('state', 'mode', 'start_time', 'set_temp', 'steam_temp', 'max_temp', 'boiler_temp',
+                 'autotune', 'feed_forward', 'strategy', 'model', 'display')
+
+    def __init__(self, initial_state, width, height):
+        for key in MachineState.__slots__:
+            setattr(self, key, None)
+        self.update(initial_state)
+        self.display = {'width': width, 'height': height}
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in MachineState.__slots__
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+    def update(self, other=None):
+        if other is not None and other is not self:
+            for key in other:
+                setattr(self, key, other[key])
 
 
 class Controller(object):
-    def __init__(self, display, initial_state, controller, view, up_pin, down_pin, shot_switch, steam_switch):
+    def __init__(self, display, initial_state, controller, view, up_pin, down_pin, shot_switch, steam_switch,
+                 heater=None, profiles=None, feed_forward=None, temp_filter=None, telemetry=None):
         global state, pid
-        state = initial_state
-        self.sensor = DS18X20(pyb.Pin('X12'))
+        state = MachineState(initial_state, display.width, display.height)
+        self.sensor = DS18X20(pyb.Pin('X12'), cache='/sd/dat/roms.dat')
         self.display = display
         self.controller = controller
         self.view = view
@@ -146,46 +324,288 @@ class Controller(object):
         self.down_pin = down_pin
         self.shot_switch = shot_switch
         self.steam_switch = steam_switch
+        self.heater = heater
+        self.profiles = profiles
+        self.tuner = None
+        self.feed_forward = feed_forward or ShotFeedForward()
+        # Optional estimator (see filters.py) between the sensor and the PID,
+        # stepped once per new reading
+        self.temp_filter = temp_filter
+        # Heater output summed over the PID ticks since the last reading
+        self.heat = 0
+        self.heat_ticks = 0
+        # Optional telemetry.Telemetry, recorded at its own period
+        self.telemetry = telemetry
+        self.exporter = None
+        # Fast copy of the settings and tuned gains
+        self.backup = BackupSettings(SETTINGS_KEYS, GAIN_PROFILES)
+        # Primitives of the frame currently on screen
+        self.frame = None
+        # pyb.millis() of the last good sensor reading
+        self.reading_time = None
 
     def _draw(self, primitives):
         for primitive in primitives:
             primitive.draw(self.display)
 
-    def _update_devices_info(self):
-        state['boiler_temp'] = get_temp(self.sensor)
-        if temp_changed and debounce(last_saved, 6000):
+    def _render(self, primitives):
+        """
+        Bring the screen in line with the new frame, doing nothing at all
+        if it matches the previous one and repainting only the regions of
+        changed primitives otherwise.
+        """
+        previous = self.frame
+        self.frame = primitives
+        if previous == primitives:
+            return
+        if previous is None or len(previous) != len(primitives):
+            with self.display:
+                self._draw(primitives)
+            return
+
+        regions = []
+        for old, new in zip(previous, primitives):
+            if old == new:
+                continue
+            if isinstance(old, Background) or isinstance(new, Background):
+                with self.display:
+                    self._draw(primitives)
+                return
+            regions.append(page_bounds(old.bounds()))
+            regions.append(page_bounds(new.bounds()))
+
+        for region in regions:
+            self.display.restore(*region)
+        # Repaint every primitive touching a restored region, in frame order.
+        for primitive in primitives:
+            if isinstance(primitive, Background):
+                continue
+            bounds = primitive.bounds()
+            for region in regions:
+                if overlaps(bounds, region):
+                    primitive.draw(self.display)
+                    break
+        self.display.flush()
+
+    # Tasks:
+    def _sample(self):
+        temp = get_temp(self.sensor, None, fast=state.state)
+        if temp is None:
+            return  # nothing new, or a failed read
+        if not isinstance(temp, str):
+            if self.temp_filter:
+                self._filter(temp)
+            self.reading_time = pyb.millis()
+        state.boiler_temp = temp
+
+    def _filter(self, temp):
+        # Over the time since the previous reading, with the mean heater
+        # output meanwhile; after a gap, start over from this reading.
+        if self._sensor_stale():
+            self.temp_filter.reset(temp)
+        else:
+            u = self.heat / self.heat_ticks if self.heat_ticks else self.output
+            self.temp_filter.update(temp, pyb.elapsed_millis(self.reading_time) / 1000, u)
+        self.heat = 0
+        self.heat_ticks = 0
+
+    def _sensor_stale(self):
+        return self.reading_time is None or pyb.elapsed_millis(self.reading_time) > SENSOR_TIMEOUT
+
+    def start_autotune(self):
+        """
+        Run a relay autotune at the current set point. The resulting gains
+        replace those of the profiles for that set point (including the
+        warm-up towards it), and are saved.
+        """
+        set_temp = state.set_temp if state.mode else state.steam_temp
+        self.tuner = RelayAutotune(set_temp)
+        self.tune_profiles = ['brew', 'idle', 'warmup'] if state.mode else ['steam']
+        state.autotune = 0
+
+    def abort_autotune(self):
+        """
+        Give up a running autotune; the gains stay as they were.
+        """
+        self.tuner = None
+        state.autotune = None
+        print("Autotune aborted")
+
+    def _autotune(self, temp):
+        tuner = self.tuner
+        self.output = tuner.update(temp)
+        state.autotune = tuner.progress
+        if tuner.done:
+            kp, ki, kd = tuner.gains(PID_PERIOD)
+            for name in self.tune_profiles:
+                set_gains(pid, name, kp, ki, kd)
+                if name not in self.tuned:
+                    self.tuned.append(name)
+            # Force the new gains in on the next update.
+            pid.profile = None
+            self.tuner = None
+            state.autotune = None
+            self._save_backup()
+            try:
+                save_gains(pid, self.tuned)
+            except OSError:
+                pass
+
+    def _regulate(self):
+        temp = state.boiler_temp
+        if self._sensor_stale() or isinstance(temp, str) or temp >= state.max_temp:
+            # No recent reading, or too hot: never heat blind.
+            self.output = 0
+        else:
+            if self.temp_filter:
+                temp = self.temp_filter.value
+            self._control(temp)
+        if self.heater:
+            self.heater.set(self.output)
+        self.heat += self.output
+        self.heat_ticks += 1
+
+    def _control(self, temp):
+        if self.tuner and self.tuner.expired:
+            self.abort_autotune()
+        if self.tuner:
+            self._autotune(temp)
+        else:
+            # Profile and set point follow the machine state without a bump.
+            pid.use_profile(select_profile(state, temp),
+                            state.set_temp if state.mode else state.steam_temp)
+            pid.set_disturbance(self.feed_forward.value(pid.set_point - temp))
+            state.feed_forward = int(pid.disturbance)
+            self.output = pid.update(temp)
+
+    def _record(self):
+        temp = state.boiler_temp
+        flags = 0
+        if state.state:
+            flags |= FLAG_SHOT
+        if not state.mode:
+            flags |= FLAG_STEAM
+        if self.tuner:
+            flags |= FLAG_AUTOTUNE
+        if isinstance(temp, str):
+            flags |= FLAG_NO_SENSOR
+            temp = NAN
+        elif self._sensor_stale():
+            flags |= FLAG_NO_SENSOR
+        self.telemetry.record(pyb.millis(), temp, pid.set_point, pid.p_term, pid.i_term, pid.d_term,
+                              self.output, self.heater.duty if self.heater else self.output,
+                              pid.disturbance, flags)
+
+    def export_telemetry(self, path):
+        """
+        Write the telemetry buffer to a CSV file. The settings task writes
+        a few rows each run, so regulation carries on meanwhile.
+        """
+        self.export_file = open(path, 'w')
+        self.exporter = self.telemetry.export(self.export_file)
+
+    def _export_step(self):
+        try:
+            next(self.exporter)
+        except (StopIteration, OSError):
+            self.export_file.close()
+            self.exporter = None
+
+    def _read_inputs(self):
+        self._update_devices_info()
+        # Controllers mutate the state in place; copy back any that return
+        # a new mapping instead.
+        state.update(self.controller(state))
+
+    def _refresh(self):
+        self._render(list(self.view(state)))
+
+    def _persist(self):
+        global temp_changed, sd_stale
+        if temp_changed:
+            # The fast copy follows every change; the SD copy catches up
+            # once the buttons have been left alone for a while.
+            temp_changed = False
+            sd_stale = True
+            self._save_backup()
+        if sd_stale and debounce(last_saved, 6000):
             save_settings()
-        if state['state'] != self.shot_switch.on:
-            state['state'] = self.shot_switch.on
-            state['start_time'] = pyb.millis()
-        if state['mode'] != self.steam_switch.on:
-            state['mode'] = not state['mode']
-            if state['mode']:
-                pid.set_temp(state['set_temp'])
+        if self.exporter:
+            self._export_step()
+
+    def _save_backup(self):
+        self.backup.save(state, pid.profiles, self.tuned)
+
+    def _restore_backup(self):
+        """
+        Restore the settings from the backup registers, and return the
+        saved gains (or None if there is no valid copy).
+        """
+        saved = self.backup.load()
+        if saved is None:
+            return None
+        settings, gains = saved
+        state.update(settings)
+        return gains
+
+    def _update_devices_info(self):
+        if state.state != self.shot_switch.on:
+            state.state = self.shot_switch.on
+            state.start_time = pyb.millis()
+            # Boost the heater right away rather than waiting for the sensor.
+            if state.state:
+                self.feed_forward.start()
             else:
-                pid.set_temp(state['steam_temp'])
-        return dict(state,
-                    display={'width': self.display.width,
-                             'height': self.display.height})
+                self.feed_forward.stop()
+        if state.mode != self.steam_switch.on:
+            state.mode = not state.mode
 
     def run(self):
-        global last_up, last_down, last_saved, temp_changed, state, pid
+        global last_up, last_down, last_saved, temp_changed, sd_stale, pid
         last_up = pyb.millis()
         last_down = last_up
         last_saved = last_up
         temp_changed = False
-
-        restore_settings()
-        pid = PIDController(set_temp=state['set_temp'])
+        sd_stale = False
+
+        # The backup registers are read in microseconds; the SD card is only
+        # needed when they hold nothing (first boot, or VBAT lost power).
+        gains = self._restore_backup()
+        if gains is None:
+            restore_settings()
+        pid = make_strategy(state)
+        for name, profile in (self.profiles or {}).items():
+            pid.add_profile(name, profile)
+        if gains is None:
+            self.tuned = restore_gains(pid)
+            self._save_backup()
+        else:
+            self.tuned = list(gains)
+            for name in self.tuned:
+                set_gains(pid, name, *gains[name])
+        # Holding both set buttons at boot starts an autotune.
+        state.autotune = None
+        state.feed_forward = 0
+        if pyb.Pin(self.up_pin, pyb.Pin.IN, pyb.Pin.PULL_DOWN).value() and \
+                pyb.Pin(self.down_pin, pyb.Pin.IN, pyb.Pin.PULL_DOWN).value():
+            self.start_autotune()
         pyb.ExtInt(self.up_pin, pyb.ExtInt.IRQ_FALLING, pyb.Pin.PULL_DOWN, adjust_set_up)
         pyb.ExtInt(self.down_pin, pyb.ExtInt.IRQ_FALLING, pyb.Pin.PULL_DOWN, adjust_set_down)
 
-        while True:
-            state = self._update_devices_info()
-            state = self.controller(state)
-            pid.update(state['boiler_temp'])
-            primitives = self.view(state)
-
-            with self.display:
-                self._draw(primitives)
-                # pyb.wfi()
+        self._update_devices_info()
+        self.output = 0
+        self.scheduler = Scheduler()
+        self.scheduler.add('pid', self._regulate, PID_PERIOD, priority=0)
+        self.scheduler.add('sensor', self._sample, SENSOR_PERIOD, priority=1)
+        self.scheduler.add('inputs', self._read_inputs, INPUT_PERIOD, priority=2)
+        self.scheduler.add('display', self._refresh, DISPLAY_PERIOD, priority=3)
+        self.scheduler.add('settings', self._persist, SETTINGS_PERIOD, priority=4)
+        if self.telemetry is not None:
+            self.scheduler.add('telemetry', self._record, self.telemetry.period, priority=1)
+        try:
+            self.scheduler.run()
+        finally:
+            # The heater is switched from a timer that outlives this loop;
+            # whatever stopped it, leave the SSR off.
+            if self.heater:
+                self.heater.off()
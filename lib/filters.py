@@ -0,0 +1,126 @@
+"""
+Filters/estimators for the boiler temperature, fed between the sensor and
+the PID. All of them keep a fixed handful of scalars and do a constant
+amount of work per sample:
+
+>>> f = EMA(0.3)
+>>> estimate = f.update(reading, dt)
+
+update() takes the latest reading, the time since the previous update in
+seconds and, for filters that model the boiler, the heater output (%)
+applied over that time. The first update just adopts the reading.
+"""
+
+
+class EMA(object):
+    """
+    Exponential moving average; smooths quantisation steps at the cost of
+    some extra lag.
+    """
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def reset(self, value):
+        self.value = value
+
+    def update(self, measurement, dt, u=0):
+        if self.value is None:
+            self.reset(measurement)
+        else:
+            self.value += self.alpha * (measurement - self.value)
+        return self.value
+
+
+class LagCompensator(object):
+    """
+    Undo a first-order sensor lag (time constant tau seconds, e.g. a probe
+    in a thermowell): if the sensor follows s' = (T - s) / tau, then the
+    boiler is at T = s + tau * s'. The slope is smoothed with an EMA
+    (alpha) since differentiating a quantised reading is noisy.
+    """
+    def __init__(self, tau=5.0, alpha=0.2):
+        self.tau = tau
+        self.alpha = alpha
+        self.last = None
+        self.slope = 0
+        self.value = None
+
+    def reset(self, value):
+        self.last = value
+        self.slope = 0
+        self.value = value
+
+    def update(self, measurement, dt, u=0):
+        if self.last is None or dt <= 0:
+            self.reset(measurement)
+            return self.value
+        slope = (measurement - self.last) / dt
+        self.slope += self.alpha * (slope - self.slope)
+        self.last = measurement
+        self.value = measurement + self.tau * self.slope
+        return self.value
+
+
+class Kalman(object):
+    """
+    Two state Kalman filter over the boiler (b) and sensor (s) temperatures:
+
+        b' = (gain * u - (b - ambient)) / tau_boiler
+        s' = (b - s) / tau_sensor
+
+    Only s is measured. Fusing the heater output u lets the estimate of b
+    move as soon as the heater does, instead of after the sensor lag.
+    q and r are the process and measurement noise variances.
+    """
+    def __init__(self, gain=2.5, ambient=70.0, tau_boiler=300.0, tau_sensor=5.0, q=0.01, r=0.25):
+        self.gain = gain
+        self.ambient = ambient
+        self.tau_boiler = tau_boiler
+        self.tau_sensor = tau_sensor
+        self.q = q
+        self.r = r
+        self.boiler = None
+        self.sensor = None
+        # Covariance (symmetric): p00 boiler, p11 sensor, p01 between them
+        self.p00 = 1.0
+        self.p01 = 0.0
+        self.p11 = 1.0
+
+    @property
+    def value(self):
+        return self.boiler
+
+    def reset(self, value):
+        self.boiler = value
+        self.sensor = value
+        self.p00 = 1.0
+        self.p01 = 0.0
+        self.p11 = 1.0
+
+    def update(self, measurement, dt, u=0):
+        if self.boiler is None:
+            self.reset(measurement)
+            return self.boiler
+
+        # Predict: x = A x + B u, P = A P A' + Q
+        a00 = 1 - dt / self.tau_boiler
+        a10 = dt / self.tau_sensor
+        a11 = 1 - a10
+        boiler = a00 * self.boiler + dt * (self.gain * u + self.ambient) / self.tau_boiler
+        sensor = a10 * self.boiler + a11 * self.sensor
+        p00 = a00 * a00 * self.p00 + self.q
+        p01 = a00 * (a10 * self.p00 + a11 * self.p01)
+        p11 = a10 * a10 * self.p00 + 2 * a10 * a11 * self.p01 + a11 * a11 * self.p11 + self.q
+
+        # Correct with the sensor reading: H = [0, 1]
+        s = p11 + self.r
+        k0 = p01 / s
+        k1 = p11 / s
+        innovation = measurement - sensor
+        self.boiler = boiler + k0 * innovation
+        self.sensor = sensor + k1 * innovation
+        self.p00 = p00 - k0 * p01
+        self.p01 = p01 - k0 * p11
+        self.p11 = p11 - k1 * p11
+        return self.boiler
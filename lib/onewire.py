@@ -4,7 +4,6 @@ OneWire library ported to MicroPython by Jason Hildebrand.
 
 TODO: 
   * implement and test parasite-power mode (as an init option)
-  * port the crc checks
 
 The original upstream copyright and terms follow.
 ------------------------------------------------------------------------------
@@ -45,35 +44,78 @@ think much of that remains.  In any event that was..
 """
 
 import pyb
+import micropython
 from pyb import disable_irq
 from pyb import enable_irq
 
-class OneWire:
-    def __init__(self, pin):
+# Dallas/Maxim CRC8 (x^8 + x^5 + x^4 + 1, reflected) lookup table
+CRC8_TABLE = (
+    b'\x00\x5E\xBC\xE2\x61\x3F\xDD\x83\xC2\x9C\x7E\x20\xA3\xFD\x1F\x41'
+    b'\x9D\xC3\x21\x7F\xFC\xA2\x40\x1E\x5F\x01\xE3\xBD\x3E\x60\x82\xDC'
+    b'\x23\x7D\x9F\xC1\x42\x1C\xFE\xA0\xE1\xBF\x5D\x03\x80\xDE\x3C\x62'
+    b'\xBE\xE0\x02\x5C\xDF\x81\x63\x3D\x7C\x22\xC0\x9E\x1D\x43\xA1\xFF'
+    b'\x46\x18\xFA\xA4\x27\x79\x9B\xC5\x84\xDA\x38\x66\xE5\xBB\x59\x07'
+    b'\xDB\x85\x67\x39\xBA\xE4\x06\x58\x19\x47\xA5\xFB\x78\x26\xC4\x9A'
+    b'\x65\x3B\xD9\x87\x04\x5A\xB8\xE6\xA7\xF9\x1B\x45\xC6\x98\x7A\x24'
+    b'\xF8\xA6\x44\x1A\x99\xC7\x25\x7B\x3A\x64\x86\xD8\x5B\x05\xE7\xB9'
+    b'\x8C\xD2\x30\x6E\xED\xB3\x51\x0F\x4E\x10\xF2\xAC\x2F\x71\x93\xCD'
+    b'\x11\x4F\xAD\xF3\x70\x2E\xCC\x92\xD3\x8D\x6F\x31\xB2\xEC\x0E\x50'
+    b'\xAF\xF1\x13\x4D\xCE\x90\x72\x2C\x6D\x33\xD1\x8F\x0C\x52\xB0\xEE'
+    b'\x32\x6C\x8E\xD0\x53\x0D\xEF\xB1\xF0\xAE\x4C\x12\x91\xCF\x2D\x73'
+    b'\xCA\x94\x76\x28\xAB\xF5\x17\x49\x08\x56\xB4\xEA\x69\x37\xD5\x8B'
+    b'\x57\x09\xEB\xB5\x36\x68\x8A\xD4\x95\xCB\x29\x77\xF4\xAA\x48\x16'
+    b'\xE9\xB7\x55\x0B\x88\xD6\x34\x6A\x2B\x75\x97\xC9\x4A\x14\xF6\xA8'
+    b'\x74\x2A\xC8\x96\x15\x4B\xA9\xF7\xB6\xE8\x0A\x54\xD7\x89\x6B\x35'
+)
+
+
+def crc8_py(data):
+    """
+    Plain Python version of crc8, usable on any port or on a host.
+    """
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+try:
+    @micropython.viper
+    def _crc8(data: ptr8, n: int, table: ptr8) -> int:
+        crc = 0
+        for i in range(n):
+            crc = table[crc ^ data[i]]
+        return crc
+
+    def crc8(data):
         """
-        Pass the data pin connected to your one-wire device(s), for example Pin('X1').
-        The one-wire protocol allows for multiple devices to be attached.
+        Return the Dallas CRC8 of data. A ROM or scratchpad that ends in its
+        own CRC byte yields 0.
         """
-        self.data_pin = pin
+        return _crc8(data, len(data), CRC8_TABLE)
+except (AttributeError, NameError):
+    # No viper on this port or build (or running on a host).
+    crc8 = crc8_py
+
+
+class PinBackend(object):
+    """
+    Bit-banged 1-Wire on a GPIO pin. The pin runs in open-drain mode with
+    its pull-up, so a slot is just value(0)/value(1) with no pin.init calls,
+    and whole bytes are clocked out in a single native loop with the slot
+    delays unpacked once per transfer.
+    """
+    def __init__(self, pin):
+        self.pin = pin
         self.write_delays = (1, 40, 40, 1)
         self.read_delays = (1, 1, 40)
-
-        # cache a bunch of methods and attributes.  This is necessary in _write_bit and 
-        # _read_bit to achieve the timing required by the OneWire protocol.
-        self.cache = (pin.init, pin.value, pin.OUT_PP, pin.IN, pin.PULL_UP)
-
-        pin.init(pin.IN, pin.PULL_UP)
+        pin.init(pin.OUT_OD, pin.PULL_UP)
+        pin.value(1)
 
     def reset(self):
-        """
-        Perform the onewire reset function.
-        Returns 1 if a device asserted a presence pulse, 0 otherwise.
-
-        If you receive 0, then check your wiring and make sure you are providing
-        power and ground to your devices.
-        """
+        pin = self.pin
         retries = 25
-        self.data_pin.init(self.data_pin.IN, self.data_pin.PULL_UP)
+        pin.value(1)
 
         # We will wait up to 250uS for
         # the bus to come high, if it doesn't then it is broken or shorted
@@ -81,7 +123,7 @@ class OneWire:
 
         # wait until the wire is high... just in case
         while True:
-            if self.data_pin.value():
+            if pin.value():
                 break
             retries -= 1
             if retries == 0:
@@ -89,107 +131,217 @@ class OneWire:
             pyb.udelay(10)
 
         #  pull the bus low for at least 480us
-        self.data_pin.low()
-        self.data_pin.init(self.data_pin.OUT_PP)
+        pin.value(0)
         pyb.udelay(480)
 
         # If there is a slave present, it should pull the bus low within 60us
-        i = pyb.disable_irq()
-        self.data_pin.init(self.data_pin.IN, self.data_pin.PULL_UP)
+        i = disable_irq()
+        pin.value(1)
         pyb.udelay(70)
-        presence = not self.data_pin.value()
-        pyb.enable_irq(i)
+        presence = not pin.value()
+        enable_irq(i)
         pyb.udelay(410)
         return presence
 
+    @micropython.native
     def write_bit(self, value):
-        """
-        Write a single bit.
-        """
-        pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP = self.cache
-        self._write_bit(value, pin_init, pin_value, Pin_OUT_PP)
-
-    def _write_bit(self, value, pin_init, pin_value, Pin_OUT_PP):
-        """
-        Write a single bit - requires cached methods/attributes be passed as arguments.
-        See also write_bit()
-        """
-        d0, d1, d2, d3 = self.write_delays
+        pin_value = self.pin.value
         udelay = pyb.udelay
+        d0, d1, d2, d3 = self.write_delays
+        i = disable_irq()
+        pin_value(0)
         if value:
-            # write 1
-            i = disable_irq()
-            pin_value(0)
-            pin_init(Pin_OUT_PP)
             udelay(d0)
             pin_value(1)
             enable_irq(i)
             udelay(d1)
         else:
-            # write 0
-            i = disable_irq()
-            pin_value(0)
-            pin_init(Pin_OUT_PP)
             udelay(d2)
             pin_value(1)
             enable_irq(i)
             udelay(d3)
 
-    def write_byte(self, value):
-        """
-        Write a byte.  The pin will go tri-state at the end of the write to avoid
-        heating in a short or other mishap.
-        """
-        pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP = self.cache
-        for i in range(8):
-            self._write_bit(value & 1, pin_init, pin_value, Pin_OUT_PP)
-            value >>= 1
-        pin_init(Pin_IN, Pin_PULL_UP)
-
-    def write_bytes(self, bytestring):
-        """
-        Write a sequence of bytes.
-        """
-        for byte in bytestring:
-            self.write_byte(byte)
-
-    def _read_bit(self, pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP):
-        """
-        Read a single bit - requires cached methods/attributes be passed as arguments.
-        See also read_bit()
-        """
-        d0, d1, d2 = self.read_delays
+    @micropython.native
+    def read_bit(self):
+        pin_value = self.pin.value
         udelay = pyb.udelay
-        pin_init(Pin_IN, Pin_PULL_UP) # TODO why do we need this?
+        d0, d1, d2 = self.read_delays
         i = disable_irq()
         pin_value(0)
-        pin_init(Pin_OUT_PP)
         udelay(d0)
-        pin_init(Pin_IN, Pin_PULL_UP)
+        pin_value(1)
         udelay(d1)
         value = pin_value()
         enable_irq(i)
         udelay(d2)
         return value
 
+    @micropython.native
+    def write_bytes(self, data):
+        pin_value = self.pin.value
+        udelay = pyb.udelay
+        d0, d1, d2, d3 = self.write_delays
+        for value in data:
+            for b in range(8):
+                i = disable_irq()
+                pin_value(0)
+                if value & 1:
+                    udelay(d0)
+                    pin_value(1)
+                    enable_irq(i)
+                    udelay(d1)
+                else:
+                    udelay(d2)
+                    pin_value(1)
+                    enable_irq(i)
+                    udelay(d3)
+                value >>= 1
+
+    @micropython.native
+    def read_into(self, buf):
+        pin_value = self.pin.value
+        udelay = pyb.udelay
+        d0, d1, d2 = self.read_delays
+        for n in range(len(buf)):
+            value = 0
+            for b in range(8):
+                i = disable_irq()
+                pin_value(0)
+                udelay(d0)
+                pin_value(1)
+                udelay(d1)
+                if pin_value():
+                    value |= 1 << b
+                enable_irq(i)
+                udelay(d2)
+            buf[n] = value
+
+    def depower(self):
+        self.pin.init(self.pin.IN, self.pin.PULL_NONE)
+
+
+class UARTBackend(object):
+    """
+    1-Wire over a spare UART, with TX and RX tied to the bus through an
+    open-drain buffer (see Maxim application note 214). A reset is one
+    0xF0 byte at 9600 baud; at 115200 baud each UART byte is one time slot
+    (0xFF writes a 1 or samples the bus, 0x00 writes a 0), and the slot
+    timing comes from the UART hardware rather than from udelay.
+    """
+    def __init__(self, uart):
+        self.uart = pyb.UART(uart)
+        self.slots = bytearray(8)
+        self.uart.init(115200, bits=8, parity=None, stop=1, timeout=10)
+
+    def reset(self):
+        uart = self.uart
+        uart.init(9600, bits=8, parity=None, stop=1, timeout=10)
+        while uart.any():
+            uart.read()
+        uart.write(b'\xf0')
+        echo = uart.read(1)
+        uart.init(115200, bits=8, parity=None, stop=1, timeout=10)
+        if not echo:
+            raise OSError("OneWire UART got no echo")
+        return echo[0] != 0xF0
+
+    def _transfer(self, count):
+        self.uart.write(memoryview(self.slots)[:count])
+        # Without the full echo the slots would still hold what was written.
+        if self.uart.readinto(self.slots, count) != count:
+            raise OSError("OneWire UART got no echo")
+
+    def write_bit(self, value):
+        self.slots[0] = 0xFF if value else 0x00
+        self._transfer(1)
+
+    def read_bit(self):
+        self.slots[0] = 0xFF
+        self._transfer(1)
+        return 1 if self.slots[0] == 0xFF else 0
+
+    def write_bytes(self, data):
+        slots = self.slots
+        for value in data:
+            for b in range(8):
+                slots[b] = 0xFF if value & (1 << b) else 0x00
+            self._transfer(8)
+
+    def read_into(self, buf):
+        slots = self.slots
+        for n in range(len(buf)):
+            for b in range(8):
+                slots[b] = 0xFF
+            self._transfer(8)
+            value = 0
+            for b in range(8):
+                if slots[b] == 0xFF:
+                    value |= 1 << b
+            buf[n] = value
+
+    def depower(self):
+        self.uart.deinit()
+
+
+class OneWire:
+    def __init__(self, pin, backend=None):
+        """
+        Pass the data pin connected to your one-wire device(s), for example Pin('X1').
+        The one-wire protocol allows for multiple devices to be attached.
+
+        The bus is bit-banged on the pin by default; pass another backend
+        (e.g. UARTBackend(4)) to drive it differently. All backends provide
+        reset, write_bit, read_bit, write_bytes, read_into and depower.
+        """
+        self.data_pin = pin
+        self.backend = backend or PinBackend(pin)
+        # Reads retried per CRC mismatch, and mismatches seen so far
+        self.retries = 3
+        self.crc_errors = 0
+        self.byte = bytearray(1)
+
+    def reset(self):
+        """
+        Perform the onewire reset function.
+        Returns 1 if a device asserted a presence pulse, 0 otherwise.
+
+        If you receive 0, then check your wiring and make sure you are providing
+        power and ground to your devices.
+        """
+        return self.backend.reset()
+
+    def write_bit(self, value):
+        """
+        Write a single bit.
+        """
+        self.backend.write_bit(value)
+
+    def write_byte(self, value):
+        """
+        Write a byte.
+        """
+        self.byte[0] = value
+        self.backend.write_bytes(self.byte)
+
+    def write_bytes(self, bytestring):
+        """
+        Write a sequence of bytes.
+        """
+        self.backend.write_bytes(bytestring)
+
     def read_bit(self):
         """
         Read a single bit.
         """
-        pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP = self.cache
-        return self._read_bit(pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP)
+        return self.backend.read_bit()
 
     def read_byte(self):
         """
         Read a single byte and return the value as an integer.
         See also read_bytes()
         """
-        pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP = self.cache
-        value = 0
-        for i in range(8):
-            bit = self._read_bit(pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP)
-            value |= bit << i
-        return value
+        self.backend.read_into(self.byte)
+        return self.byte[0]
 
     def read_bytes(self, count):
         """
@@ -197,10 +349,15 @@ class OneWire:
         The bytes are returned as a bytearray.
         """
         s = bytearray(count)
-        for i in range(count):
-            s[i] = self.read_byte()
+        self.backend.read_into(s)
         return s
 
+    def read_into(self, buf):
+        """
+        Read len(buf) bytes into an existing buffer.
+        """
+        self.backend.read_into(buf)
+
     def select_rom(self, rom):
         """
         Select a specific device to talk to.  Pass in rom as a bytearray (8 bytes).
@@ -214,11 +371,14 @@ class OneWire:
         """
         Read the ROM - this works if there is only a single device attached.
         """
-        self.reset()
-        self.write_byte(0x33)   # READ ROM
-        rom = self.read_bytes(8)
-        # TODO: check CRC of the ROM
-        return rom
+        for attempt in range(self.retries + 1):
+            self.reset()
+            self.write_byte(0x33)   # READ ROM
+            rom = self.read_bytes(8)
+            if crc8(rom) == 0:
+                return rom
+            self.crc_errors += 1
+        raise OSError("OneWire ROM CRC mismatch")
 
     def skip_rom(self):
         """
@@ -227,20 +387,44 @@ class OneWire:
         self.write_byte(0xCC)   # SKIP ROM
 
     def depower(self):
-        self.data_pin.init(self.data_pin.IN, self.data_pin.PULL_NONE)
+        self.backend.depower()
 
-    def scan(self):
+    def scan(self, family=None):
         """
         Return a list of ROMs for all attached devices. 
         Each ROM is returned as a bytes object of 8 bytes.
+        Pass a family code (first ROM byte) to search for that family only;
+        the search then starts at the family and stops as soon as it leaves it.
+        The search is restarted if any ROM fails its CRC check.
         """
-        devices = []
-        self._reset_search()
-        while True:
-            rom = self._search()
-            if not rom:
-                return devices
-            devices.append(rom)
+        for attempt in range(self.retries + 1):
+            devices = []
+            self._reset_search()
+            if family is not None:
+                # Target setup: make the search start at the first ROM of the family.
+                self.rom[0] = family
+                self.last_discrepancy = 64
+            while True:
+                rom = self._search()
+                if not rom or (family is not None and rom[0] != family):
+                    return devices
+                if crc8(rom) != 0:
+                    self.crc_errors += 1
+                    break
+                devices.append(rom)
+        raise OSError("OneWire ROM CRC mismatch")
+
+    def verify(self, rom):
+        """
+        Check that the device with the given ROM is on the bus, by matching
+        its ROM and reading back a scratchpad that passes its CRC.
+        """
+        if not self.reset():
+            return False
+        self.select_rom(rom)
+        self.write_byte(0xBE)   # READ SCRATCHPAD
+        data = self.read_bytes(9)
+        return crc8(data) == 0 and data[4] != 0
 
     def _reset_search(self):
         self.last_discrepancy = 0
@@ -255,7 +439,8 @@ class OneWire:
         rom_byte_number = 0
         rom_byte_mask = 1
         search_result = 0
-        pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP = self.cache
+        read_bit = self.backend.read_bit
+        write_bit = self.backend.write_bit
 
         # if the last call was not the last one
         if not self.last_device_flag:
@@ -270,8 +455,8 @@ class OneWire:
             # loop to do the search
             while rom_byte_number < 8:  # loop until through all ROM bytes 0-7
                 # read a bit and its complement
-                id_bit = self._read_bit(pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP)
-                cmp_id_bit = self._read_bit(pin_init, pin_value, Pin_OUT_PP, Pin_IN, Pin_PULL_UP)
+                id_bit = read_bit()
+                cmp_id_bit = read_bit()
 
                 # check for no devices on 1-wire
                 if (id_bit == 1) and (cmp_id_bit == 1):
@@ -306,7 +491,7 @@ class OneWire:
 
                 # serial number search direction write bit
                 #print('sd', search_direction)
-                self.write_bit(search_direction)
+                write_bit(search_direction)
 
                 # increment the byte counter id_bit_number
                 # and shift the mask rom_byte_mask
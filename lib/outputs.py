@@ -0,0 +1,66 @@
+import pyb
+
+
+class TimeProportional(object):
+    """
+    Drive an SSR with slow PWM: each `window` ms the output is switched on
+    for a share of the window proportional to the requested duty (0-100%).
+    The switching runs from a pyb.Timer callback, so its timing doesn't
+    depend on the main loop; the callback only does small int arithmetic
+    and never allocates.
+
+    On times shorter than min_on, and off times shorter than min_off, are
+    rounded to fully off/on to spare the SSR and the mains from
+    needlessly short pulses.
+    """
+    def __init__(self, pin, timer=2, window=1000, tick=10, min_on=20, min_off=20):
+        self.pin = pyb.Pin(pin, pyb.Pin.OUT_PP)
+        self.pin.low()
+        self.tick = tick
+        self.window_ticks = window // tick
+        self.min_on_ticks = min_on // tick
+        self.min_off_ticks = min_off // tick
+
+        # Requested on ticks, and the value latched for the current window
+        self.on_ticks = 0
+        self.window_on = 0
+        self.count = 0
+
+        # Bound once so the ISR doesn't allocate a new method object.
+        self._tick_ref = self._tick
+        self.timer = pyb.Timer(timer, freq=1000 // tick)
+        self.timer.callback(self._tick_ref)
+
+    def set(self, duty):
+        """
+        Set the duty cycle in percent; values outside 0-100 are clamped.
+        Takes effect at the start of the next window.
+        """
+        on = int(duty * self.window_ticks / 100)
+        if on < self.min_on_ticks:
+            on = 0
+        elif on > self.window_ticks - self.min_off_ticks:
+            on = self.window_ticks
+        self.on_ticks = on
+
+    @property
+    def duty(self):
+        return self.on_ticks * 100 // self.window_ticks
+
+    def off(self):
+        self.on_ticks = 0
+        self.window_on = 0
+        self.pin.low()
+
+    def _tick(self, timer):
+        count = self.count
+        if count == 0:
+            self.window_on = self.on_ticks
+        if count < self.window_on:
+            self.pin.high()
+        else:
+            self.pin.low()
+        count += 1
+        if count >= self.window_ticks:
+            count = 0
+        self.count = count
@@ -0,0 +1,89 @@
+"""
+Cooperative multi-rate scheduler.
+
+Each task is a plain function run at its own fixed period. Releases are
+kept on a fixed grid (due += period), so a task's rate doesn't drift with
+how long it or anything else takes. When several tasks are due, the one
+with the lowest priority number runs first, and the scan restarts after
+every run, so a slow low priority task (e.g. the display) only ever
+delays a high priority one (e.g. the PID) by its own run time.
+
+>>> s = Scheduler()
+>>> s.add('pid', regulate, period=200, priority=0)
+>>> s.add('display', refresh, period=100, priority=3)
+>>> s.run()
+
+A task that misses a whole release is counted as an overrun and its
+skipped releases are dropped rather than run back to back. report()
+prints per task run counts, overruns and worst case run time.
+"""
+
+import pyb
+import time
+
+
+class Task(object):
+    def __init__(self, name, fn, period, priority=0):
+        self.name = name
+        self.fn = fn
+        self.period = period
+        self.priority = priority
+        self.due = time.ticks_ms()
+
+        self.runs = 0
+        self.overruns = 0
+        self.max_us = 0
+
+    def run(self, now):
+        late = time.ticks_diff(now, self.due)
+        if late >= self.period:
+            # Missed at least one whole release; skip ahead on the grid.
+            self.overruns += 1
+            self.due = time.ticks_add(self.due, (late // self.period) * self.period)
+        self.due = time.ticks_add(self.due, self.period)
+
+        start = time.ticks_us()
+        self.fn()
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        self.runs += 1
+        if elapsed > self.max_us:
+            self.max_us = elapsed
+        if elapsed > self.period * 1000:
+            self.overruns += 1
+
+
+class Scheduler(object):
+    def __init__(self):
+        self.tasks = []
+
+    def add(self, name, fn, period, priority=0):
+        """
+        Run fn every `period` ms. Lower priority numbers run first.
+        """
+        task = Task(name, fn, period, priority)
+        i = 0
+        while i < len(self.tasks) and self.tasks[i].priority <= priority:
+            i += 1
+        self.tasks.insert(i, task)
+        return task
+
+    def run_once(self):
+        """
+        Run the most important task that is due, if any. Returns True if
+        a task ran.
+        """
+        now = time.ticks_ms()
+        for task in self.tasks:
+            if time.ticks_diff(now, task.due) >= 0:
+                task.run(now)
+                return True
+        return False
+
+    def run(self):
+        while True:
+            if not self.run_once():
+                pyb.wfi()
+
+    def report(self):
+        for task in self.tasks:
+            print(task.name, 'runs', task.runs, 'overruns', task.overruns, 'max_us', task.max_us)
@@ -0,0 +1,109 @@
+"""
+Settings kept as an append-only log of fixed size binary records.
+
+Each save appends one record holding every setting; nothing is rewritten
+in place, so a crash or power cut mid-write can at worst leave a torn
+last record, which fails its CRC and is skipped. Restoring reads records
+from the end of the file back, and stops at the first valid one:
+
+>>> log = SettingsLog('/sd/dat/settings.log', ('set_temp', 'steam_temp'))
+>>> log.append({'set_temp': 201, 'steam_temp': 240})
+>>> log.load()
+{'set_temp': 201, 'steam_temp': 240}
+
+A record is a magic byte, a 32 bit sequence number, one signed 16 bit int
+per key and the Dallas CRC8 of all of that. Once the log holds `capacity`
+records it is compacted to just the latest one: written to a temporary
+file and renamed over the log, so the file stays small and there is
+always an intact copy to boot from.
+"""
+
+import os
+import struct
+from Espyresso.lib.onewire import crc8
+
+MAGIC = 0xA5
+
+
+class SettingsLog(object):
+    def __init__(self, path, keys, capacity=64):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.keys = keys
+        self.capacity = capacity
+        self.format = '<BI' + 'h' * len(keys)
+        self.size = struct.calcsize(self.format) + 1
+        self.record = bytearray(self.size)
+        # Sequence number and position (records) of the next append
+        self.seq = 0
+        self.count = None
+
+    def _pack(self, values):
+        struct.pack_into(self.format, self.record, 0, MAGIC, self.seq, *[int(values[key]) for key in self.keys])
+        self.record[-1] = crc8(memoryview(self.record)[:-1])
+        return self.record
+
+    def _unpack(self, record):
+        if record[0] != MAGIC or crc8(record) != 0:
+            return None
+        fields = struct.unpack_from(self.format, record, 0)
+        self.seq = fields[1] + 1
+        return dict(zip(self.keys, fields[2:]))
+
+    def _read_last(self, path):
+        with open(path, 'rb') as file:
+            # Whole records only; a torn tail is ignored.
+            count = file.seek(0, 2) // self.size
+            record = bytearray(self.size)
+            for i in range(count - 1, -1, -1):
+                file.seek(i * self.size)
+                file.readinto(record)
+                values = self._unpack(record)
+                if values is not None:
+                    return values, count
+        return None, count
+
+    def load(self):
+        """
+        Return the latest valid settings as a dict, or None if there are
+        none (e.g. first boot, or no storage).
+        """
+        for path in (self.path, self.tmp_path):
+            try:
+                values, count = self._read_last(path)
+            except OSError:
+                continue
+            if path == self.path:
+                self.count = count
+            if values is not None:
+                return values
+        return None
+
+    def append(self, values):
+        """
+        Save the settings in `values` (a dict or anything indexable by the
+        keys) as a new record. Raises OSError if the storage isn't there.
+        """
+        if self.count is None:
+            self.load()
+        if self.count is None or self.count >= self.capacity:
+            self.compact(values)
+            return
+        record = self._pack(values)
+        with open(self.path, 'r+b') as file:
+            # Write over any torn record rather than after it.
+            file.seek(self.count * self.size)
+            file.write(record)
+        self.seq += 1
+        self.count += 1
+
+    def compact(self, values):
+        """
+        Replace the log with a single record of `values`.
+        """
+        record = self._pack(values)
+        with open(self.tmp_path, 'wb') as file:
+            file.write(record)
+        os.rename(self.tmp_path, self.path)
+        self.seq += 1
+        self.count = 1
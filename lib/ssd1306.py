@@ -74,267 +74,345 @@ DEVID = 0x3c
 CTL_CMD = 0x80
 CTL_DAT = 0x40
 
+# Marker stored in a page's dirty low column when nothing on it changed
+# since the last flush.
+CLEAN = 0xFF
 
-class Font5x8:
-    cols = 5
-    rows = 8
-    bytes = [
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x3E, 0x5B, 0x4F, 0x5B, 0x3E,
-        0x3E, 0x6B, 0x4F, 0x6B, 0x3E,
-        0x1C, 0x3E, 0x7C, 0x3E, 0x1C,
-        0x18, 0x3C, 0x7E, 0x3C, 0x18,
-        0x1C, 0x57, 0x7D, 0x57, 0x1C,
-        0x1C, 0x5E, 0x7F, 0x5E, 0x1C,
-        0x00, 0x18, 0x3C, 0x18, 0x00,
-        0xFF, 0xE7, 0xC3, 0xE7, 0xFF,
-        0x00, 0x18, 0x24, 0x18, 0x00,
-        0xFF, 0xE7, 0xDB, 0xE7, 0xFF,
-        0x30, 0x48, 0x3A, 0x06, 0x0E,
-        0x26, 0x29, 0x79, 0x29, 0x26,
-        0x40, 0x7F, 0x05, 0x05, 0x07,
-        0x40, 0x7F, 0x05, 0x25, 0x3F,
-        0x5A, 0x3C, 0xE7, 0x3C, 0x5A,
-        0x7F, 0x3E, 0x1C, 0x1C, 0x08,
-        0x08, 0x1C, 0x1C, 0x3E, 0x7F,
-        0x14, 0x22, 0x7F, 0x22, 0x14,
-        0x5F, 0x5F, 0x00, 0x5F, 0x5F,
-        0x06, 0x09, 0x7F, 0x01, 0x7F,
-        0x00, 0x66, 0x89, 0x95, 0x6A,
-        0x60, 0x60, 0x60, 0x60, 0x60,
-        0x94, 0xA2, 0xFF, 0xA2, 0x94,
-        0x08, 0x04, 0x7E, 0x04, 0x08,
-        0x10, 0x20, 0x7E, 0x20, 0x10,
-        0x08, 0x08, 0x2A, 0x1C, 0x08,
-        0x08, 0x1C, 0x2A, 0x08, 0x08,
-        0x1E, 0x10, 0x10, 0x10, 0x10,
-        0x0C, 0x1E, 0x0C, 0x1E, 0x0C,
-        0x30, 0x38, 0x3E, 0x38, 0x30,
-        0x06, 0x0E, 0x3E, 0x0E, 0x06,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-        0x00, 0x00, 0x5F, 0x00, 0x00,
-        0x00, 0x07, 0x00, 0x07, 0x00,
-        0x14, 0x7F, 0x14, 0x7F, 0x14,
-        0x24, 0x2A, 0x7F, 0x2A, 0x12,
-        0x23, 0x13, 0x08, 0x64, 0x62,
-        0x36, 0x49, 0x56, 0x20, 0x50,
-        0x00, 0x08, 0x07, 0x03, 0x00,
-        0x00, 0x1C, 0x22, 0x41, 0x00,
-        0x00, 0x41, 0x22, 0x1C, 0x00,
-        0x2A, 0x1C, 0x7F, 0x1C, 0x2A,
-        0x08, 0x08, 0x3E, 0x08, 0x08,
-        0x00, 0x80, 0x70, 0x30, 0x00,
-        0x08, 0x08, 0x08, 0x08, 0x08,
-        0x00, 0x00, 0x60, 0x60, 0x00,
-        0x20, 0x10, 0x08, 0x04, 0x02,
-        0x3E, 0x51, 0x49, 0x45, 0x3E,
-        0x00, 0x42, 0x7F, 0x40, 0x00,
-        0x72, 0x49, 0x49, 0x49, 0x46,
-        0x21, 0x41, 0x49, 0x4D, 0x33,
-        0x18, 0x14, 0x12, 0x7F, 0x10,
-        0x27, 0x45, 0x45, 0x45, 0x39,
-        0x3C, 0x4A, 0x49, 0x49, 0x31,
-        0x41, 0x21, 0x11, 0x09, 0x07,
-        0x36, 0x49, 0x49, 0x49, 0x36,
-        0x46, 0x49, 0x49, 0x29, 0x1E,
-        0x00, 0x00, 0x14, 0x00, 0x00,
-        0x00, 0x40, 0x34, 0x00, 0x00,
-        0x00, 0x08, 0x14, 0x22, 0x41,
-        0x14, 0x14, 0x14, 0x14, 0x14,
-        0x00, 0x41, 0x22, 0x14, 0x08,
-        0x02, 0x01, 0x59, 0x09, 0x06,
-        0x3E, 0x41, 0x5D, 0x59, 0x4E,
-        0x7C, 0x12, 0x11, 0x12, 0x7C,
-        0x7F, 0x49, 0x49, 0x49, 0x36,
-        0x3E, 0x41, 0x41, 0x41, 0x22,
-        0x7F, 0x41, 0x41, 0x41, 0x3E,
-        0x7F, 0x49, 0x49, 0x49, 0x41,
-        0x7F, 0x09, 0x09, 0x09, 0x01,
-        0x3E, 0x41, 0x41, 0x51, 0x73,
-        0x7F, 0x08, 0x08, 0x08, 0x7F,
-        0x00, 0x41, 0x7F, 0x41, 0x00,
-        0x20, 0x40, 0x41, 0x3F, 0x01,
-        0x7F, 0x08, 0x14, 0x22, 0x41,
-        0x7F, 0x40, 0x40, 0x40, 0x40,
-        0x7F, 0x02, 0x1C, 0x02, 0x7F,
-        0x7F, 0x04, 0x08, 0x10, 0x7F,
-        0x3E, 0x41, 0x41, 0x41, 0x3E,
-        0x7F, 0x09, 0x09, 0x09, 0x06,
-        0x3E, 0x41, 0x51, 0x21, 0x5E,
-        0x7F, 0x09, 0x19, 0x29, 0x46,
-        0x26, 0x49, 0x49, 0x49, 0x32,
-        0x03, 0x01, 0x7F, 0x01, 0x03,
-        0x3F, 0x40, 0x40, 0x40, 0x3F,
-        0x1F, 0x20, 0x40, 0x20, 0x1F,
-        0x3F, 0x40, 0x38, 0x40, 0x3F,
-        0x63, 0x14, 0x08, 0x14, 0x63,
-        0x03, 0x04, 0x78, 0x04, 0x03,
-        0x61, 0x59, 0x49, 0x4D, 0x43,
-        0x00, 0x7F, 0x41, 0x41, 0x41,
-        0x02, 0x04, 0x08, 0x10, 0x20,
-        0x00, 0x41, 0x41, 0x41, 0x7F,
-        0x04, 0x02, 0x01, 0x02, 0x04,
-        0x40, 0x40, 0x40, 0x40, 0x40,
-        0x00, 0x03, 0x07, 0x08, 0x00,
-        0x20, 0x54, 0x54, 0x78, 0x40,
-        0x7F, 0x28, 0x44, 0x44, 0x38,
-        0x38, 0x44, 0x44, 0x44, 0x28,
-        0x38, 0x44, 0x44, 0x28, 0x7F,
-        0x38, 0x54, 0x54, 0x54, 0x18,
-        0x00, 0x08, 0x7E, 0x09, 0x02,
-        0x18, 0xA4, 0xA4, 0x9C, 0x78,
-        0x7F, 0x08, 0x04, 0x04, 0x78,
-        0x00, 0x44, 0x7D, 0x40, 0x00,
-        0x20, 0x40, 0x40, 0x3D, 0x00,
-        0x7F, 0x10, 0x28, 0x44, 0x00,
-        0x00, 0x41, 0x7F, 0x40, 0x00,
-        0x7C, 0x04, 0x78, 0x04, 0x78,
-        0x7C, 0x08, 0x04, 0x04, 0x78,
-        0x38, 0x44, 0x44, 0x44, 0x38,
-        0xFC, 0x18, 0x24, 0x24, 0x18,
-        0x18, 0x24, 0x24, 0x18, 0xFC,
-        0x7C, 0x08, 0x04, 0x04, 0x08,
-        0x48, 0x54, 0x54, 0x54, 0x24,
-        0x04, 0x04, 0x3F, 0x44, 0x24,
-        0x3C, 0x40, 0x40, 0x20, 0x7C,
-        0x1C, 0x20, 0x40, 0x20, 0x1C,
-        0x3C, 0x40, 0x30, 0x40, 0x3C,
-        0x44, 0x28, 0x10, 0x28, 0x44,
-        0x4C, 0x90, 0x90, 0x90, 0x7C,
-        0x44, 0x64, 0x54, 0x4C, 0x44,
-        0x00, 0x08, 0x36, 0x41, 0x00,
-        0x00, 0x00, 0x77, 0x00, 0x00,
-        0x00, 0x41, 0x36, 0x08, 0x00,
-        0x02, 0x01, 0x02, 0x04, 0x02,
-        0x3C, 0x26, 0x23, 0x26, 0x3C,
-        0x1E, 0xA1, 0xA1, 0x61, 0x12,
-        0x3A, 0x40, 0x40, 0x20, 0x7A,
-        0x38, 0x54, 0x54, 0x55, 0x59,
-        0x21, 0x55, 0x55, 0x79, 0x41,
-        0x21, 0x54, 0x54, 0x78, 0x41,
-        0x21, 0x55, 0x54, 0x78, 0x40,
-        0x20, 0x54, 0x55, 0x79, 0x40,
-        0x0C, 0x1E, 0x52, 0x72, 0x12,
-        0x39, 0x55, 0x55, 0x55, 0x59,
-        0x39, 0x54, 0x54, 0x54, 0x59,
-        0x39, 0x55, 0x54, 0x54, 0x58,
-        0x00, 0x00, 0x45, 0x7C, 0x41,
-        0x00, 0x02, 0x45, 0x7D, 0x42,
-        0x00, 0x01, 0x45, 0x7C, 0x40,
-        0xF0, 0x29, 0x24, 0x29, 0xF0,
-        0xF0, 0x28, 0x25, 0x28, 0xF0,
-        0x7C, 0x54, 0x55, 0x45, 0x00,
-        0x20, 0x54, 0x54, 0x7C, 0x54,
-        0x7C, 0x0A, 0x09, 0x7F, 0x49,
-        0x32, 0x49, 0x49, 0x49, 0x32,
-        0x32, 0x48, 0x48, 0x48, 0x32,
-        0x32, 0x4A, 0x48, 0x48, 0x30,
-        0x3A, 0x41, 0x41, 0x21, 0x7A,
-        0x3A, 0x42, 0x40, 0x20, 0x78,
-        0x00, 0x9D, 0xA0, 0xA0, 0x7D,
-        0x39, 0x44, 0x44, 0x44, 0x39,
-        0x3D, 0x40, 0x40, 0x40, 0x3D,
-        0x3C, 0x24, 0xFF, 0x24, 0x24,
-        0x48, 0x7E, 0x49, 0x43, 0x66,
-        0x2B, 0x2F, 0xFC, 0x2F, 0x2B,
-        0xFF, 0x09, 0x29, 0xF6, 0x20,
-        0xC0, 0x88, 0x7E, 0x09, 0x03,
-        0x20, 0x54, 0x54, 0x79, 0x41,
-        0x00, 0x00, 0x44, 0x7D, 0x41,
-        0x30, 0x48, 0x48, 0x4A, 0x32,
-        0x38, 0x40, 0x40, 0x22, 0x7A,
-        0x00, 0x7A, 0x0A, 0x0A, 0x72,
-        0x7D, 0x0D, 0x19, 0x31, 0x7D,
-        0x26, 0x29, 0x29, 0x2F, 0x28,
-        0x26, 0x29, 0x29, 0x29, 0x26,
-        0x30, 0x48, 0x4D, 0x40, 0x20,
-        0x38, 0x08, 0x08, 0x08, 0x08,
-        0x08, 0x08, 0x08, 0x08, 0x38,
-        0x2F, 0x10, 0xC8, 0xAC, 0xBA,
-        0x2F, 0x10, 0x28, 0x34, 0xFA,
-        0x00, 0x00, 0x7B, 0x00, 0x00,
-        0x08, 0x14, 0x2A, 0x14, 0x22,
-        0x22, 0x14, 0x2A, 0x14, 0x08,
-        0xAA, 0x00, 0x55, 0x00, 0xAA,
-        0xAA, 0x55, 0xAA, 0x55, 0xAA,
-        0x00, 0x00, 0x00, 0xFF, 0x00,
-        0x10, 0x10, 0x10, 0xFF, 0x00,
-        0x14, 0x14, 0x14, 0xFF, 0x00,
-        0x10, 0x10, 0xFF, 0x00, 0xFF,
-        0x10, 0x10, 0xF0, 0x10, 0xF0,
-        0x14, 0x14, 0x14, 0xFC, 0x00,
-        0x14, 0x14, 0xF7, 0x00, 0xFF,
-        0x00, 0x00, 0xFF, 0x00, 0xFF,
-        0x14, 0x14, 0xF4, 0x04, 0xFC,
-        0x14, 0x14, 0x17, 0x10, 0x1F,
-        0x10, 0x10, 0x1F, 0x10, 0x1F,
-        0x14, 0x14, 0x14, 0x1F, 0x00,
-        0x10, 0x10, 0x10, 0xF0, 0x00,
-        0x00, 0x00, 0x00, 0x1F, 0x10,
-        0x10, 0x10, 0x10, 0x1F, 0x10,
-        0x10, 0x10, 0x10, 0xF0, 0x10,
-        0x00, 0x00, 0x00, 0xFF, 0x10,
-        0x10, 0x10, 0x10, 0x10, 0x10,
-        0x10, 0x10, 0x10, 0xFF, 0x10,
-        0x00, 0x00, 0x00, 0xFF, 0x14,
-        0x00, 0x00, 0xFF, 0x00, 0xFF,
-        0x00, 0x00, 0x1F, 0x10, 0x17,
-        0x00, 0x00, 0xFC, 0x04, 0xF4,
-        0x14, 0x14, 0x17, 0x10, 0x17,
-        0x14, 0x14, 0xF4, 0x04, 0xF4,
-        0x00, 0x00, 0xFF, 0x00, 0xF7,
-        0x14, 0x14, 0x14, 0x14, 0x14,
-        0x14, 0x14, 0xF7, 0x00, 0xF7,
-        0x14, 0x14, 0x14, 0x17, 0x14,
-        0x10, 0x10, 0x1F, 0x10, 0x1F,
-        0x14, 0x14, 0x14, 0xF4, 0x14,
-        0x10, 0x10, 0xF0, 0x10, 0xF0,
-        0x00, 0x00, 0x1F, 0x10, 0x1F,
-        0x00, 0x00, 0x00, 0x1F, 0x14,
-        0x00, 0x00, 0x00, 0xFC, 0x14,
-        0x00, 0x00, 0xF0, 0x10, 0xF0,
-        0x10, 0x10, 0xFF, 0x10, 0xFF,
-        0x14, 0x14, 0x14, 0xFF, 0x14,
-        0x10, 0x10, 0x10, 0x1F, 0x00,
-        0x00, 0x00, 0x00, 0xF0, 0x10,
-        0xFF, 0xFF, 0xFF, 0xFF, 0xFF,
-        0xF0, 0xF0, 0xF0, 0xF0, 0xF0,
-        0xFF, 0xFF, 0xFF, 0x00, 0x00,
-        0x00, 0x00, 0x00, 0xFF, 0xFF,
-        0x0F, 0x0F, 0x0F, 0x0F, 0x0F,
-        0x38, 0x44, 0x44, 0x38, 0x44,
-        0x7C, 0x2A, 0x2A, 0x3E, 0x14,
-        0x7E, 0x02, 0x02, 0x06, 0x06,
-        0x02, 0x7E, 0x02, 0x7E, 0x02,
-        0x63, 0x55, 0x49, 0x41, 0x63,
-        0x38, 0x44, 0x44, 0x3C, 0x04,
-        0x40, 0x7E, 0x20, 0x1E, 0x20,
-        0x06, 0x02, 0x7E, 0x02, 0x02,
-        0x99, 0xA5, 0xE7, 0xA5, 0x99,
-        0x1C, 0x2A, 0x49, 0x2A, 0x1C,
-        0x4C, 0x72, 0x01, 0x72, 0x4C,
-        0x30, 0x4A, 0x4D, 0x4D, 0x30,
-        0x30, 0x48, 0x78, 0x48, 0x30,
-        0xBC, 0x62, 0x5A, 0x46, 0x3D,
-        0x3E, 0x49, 0x49, 0x49, 0x00,
-        0x7E, 0x01, 0x01, 0x01, 0x7E,
-        0x2A, 0x2A, 0x2A, 0x2A, 0x2A,
-        0x44, 0x44, 0x5F, 0x44, 0x44,
-        0x40, 0x51, 0x4A, 0x44, 0x40,
-        0x40, 0x44, 0x4A, 0x51, 0x40,
-        0x00, 0x00, 0xFF, 0x01, 0x03,
-        0xE0, 0x80, 0xFF, 0x00, 0x00,
-        0x08, 0x08, 0x6B, 0x6B, 0x08,
-        0x36, 0x12, 0x36, 0x24, 0x36,
-        0x06, 0x0F, 0x09, 0x0F, 0x06,
-        0x00, 0x00, 0x18, 0x18, 0x00,
-        0x00, 0x00, 0x10, 0x10, 0x00,
-        0x30, 0x40, 0xFF, 0x01, 0x01,
-        0x00, 0x1F, 0x01, 0x01, 0x1E,
-        0x00, 0x19, 0x1D, 0x17, 0x12,
-        0x00, 0x3C, 0x3C, 0x3C, 0x3C,
-        0x00, 0x00, 0x00, 0x00, 0x00,
-    ]
+
+# Standard 5x8 font, 255 glyphs of 5 column bytes each. Kept as a bytes
+# constant so it stays in flash when this module is frozen.
+FONT5X8 = (
+    b'\x00\x00\x00\x00\x00'
+    b'\x3E\x5B\x4F\x5B\x3E'
+    b'\x3E\x6B\x4F\x6B\x3E'
+    b'\x1C\x3E\x7C\x3E\x1C'
+    b'\x18\x3C\x7E\x3C\x18'
+    b'\x1C\x57\x7D\x57\x1C'
+    b'\x1C\x5E\x7F\x5E\x1C'
+    b'\x00\x18\x3C\x18\x00'
+    b'\xFF\xE7\xC3\xE7\xFF'
+    b'\x00\x18\x24\x18\x00'
+    b'\xFF\xE7\xDB\xE7\xFF'
+    b'\x30\x48\x3A\x06\x0E'
+    b'\x26\x29\x79\x29\x26'
+    b'\x40\x7F\x05\x05\x07'
+    b'\x40\x7F\x05\x25\x3F'
+    b'\x5A\x3C\xE7\x3C\x5A'
+    b'\x7F\x3E\x1C\x1C\x08'
+    b'\x08\x1C\x1C\x3E\x7F'
+    b'\x14\x22\x7F\x22\x14'
+    b'\x5F\x5F\x00\x5F\x5F'
+    b'\x06\x09\x7F\x01\x7F'
+    b'\x00\x66\x89\x95\x6A'
+    b'\x60\x60\x60\x60\x60'
+    b'\x94\xA2\xFF\xA2\x94'
+    b'\x08\x04\x7E\x04\x08'
+    b'\x10\x20\x7E\x20\x10'
+    b'\x08\x08\x2A\x1C\x08'
+    b'\x08\x1C\x2A\x08\x08'
+    b'\x1E\x10\x10\x10\x10'
+    b'\x0C\x1E\x0C\x1E\x0C'
+    b'\x30\x38\x3E\x38\x30'
+    b'\x06\x0E\x3E\x0E\x06'
+    b'\x00\x00\x00\x00\x00'
+    b'\x00\x00\x5F\x00\x00'
+    b'\x00\x07\x00\x07\x00'
+    b'\x14\x7F\x14\x7F\x14'
+    b'\x24\x2A\x7F\x2A\x12'
+    b'\x23\x13\x08\x64\x62'
+    b'\x36\x49\x56\x20\x50'
+    b'\x00\x08\x07\x03\x00'
+    b'\x00\x1C\x22\x41\x00'
+    b'\x00\x41\x22\x1C\x00'
+    b'\x2A\x1C\x7F\x1C\x2A'
+    b'\x08\x08\x3E\x08\x08'
+    b'\x00\x80\x70\x30\x00'
+    b'\x08\x08\x08\x08\x08'
+    b'\x00\x00\x60\x60\x00'
+    b'\x20\x10\x08\x04\x02'
+    b'\x3E\x51\x49\x45\x3E'
+    b'\x00\x42\x7F\x40\x00'
+    b'\x72\x49\x49\x49\x46'
+    b'\x21\x41\x49\x4D\x33'
+    b'\x18\x14\x12\x7F\x10'
+    b'\x27\x45\x45\x45\x39'
+    b'\x3C\x4A\x49\x49\x31'
+    b'\x41\x21\x11\x09\x07'
+    b'\x36\x49\x49\x49\x36'
+    b'\x46\x49\x49\x29\x1E'
+    b'\x00\x00\x14\x00\x00'
+    b'\x00\x40\x34\x00\x00'
+    b'\x00\x08\x14\x22\x41'
+    b'\x14\x14\x14\x14\x14'
+    b'\x00\x41\x22\x14\x08'
+    b'\x02\x01\x59\x09\x06'
+    b'\x3E\x41\x5D\x59\x4E'
+    b'\x7C\x12\x11\x12\x7C'
+    b'\x7F\x49\x49\x49\x36'
+    b'\x3E\x41\x41\x41\x22'
+    b'\x7F\x41\x41\x41\x3E'
+    b'\x7F\x49\x49\x49\x41'
+    b'\x7F\x09\x09\x09\x01'
+    b'\x3E\x41\x41\x51\x73'
+    b'\x7F\x08\x08\x08\x7F'
+    b'\x00\x41\x7F\x41\x00'
+    b'\x20\x40\x41\x3F\x01'
+    b'\x7F\x08\x14\x22\x41'
+    b'\x7F\x40\x40\x40\x40'
+    b'\x7F\x02\x1C\x02\x7F'
+    b'\x7F\x04\x08\x10\x7F'
+    b'\x3E\x41\x41\x41\x3E'
+    b'\x7F\x09\x09\x09\x06'
+    b'\x3E\x41\x51\x21\x5E'
+    b'\x7F\x09\x19\x29\x46'
+    b'\x26\x49\x49\x49\x32'
+    b'\x03\x01\x7F\x01\x03'
+    b'\x3F\x40\x40\x40\x3F'
+    b'\x1F\x20\x40\x20\x1F'
+    b'\x3F\x40\x38\x40\x3F'
+    b'\x63\x14\x08\x14\x63'
+    b'\x03\x04\x78\x04\x03'
+    b'\x61\x59\x49\x4D\x43'
+    b'\x00\x7F\x41\x41\x41'
+    b'\x02\x04\x08\x10\x20'
+    b'\x00\x41\x41\x41\x7F'
+    b'\x04\x02\x01\x02\x04'
+    b'\x40\x40\x40\x40\x40'
+    b'\x00\x03\x07\x08\x00'
+    b'\x20\x54\x54\x78\x40'
+    b'\x7F\x28\x44\x44\x38'
+    b'\x38\x44\x44\x44\x28'
+    b'\x38\x44\x44\x28\x7F'
+    b'\x38\x54\x54\x54\x18'
+    b'\x00\x08\x7E\x09\x02'
+    b'\x18\xA4\xA4\x9C\x78'
+    b'\x7F\x08\x04\x04\x78'
+    b'\x00\x44\x7D\x40\x00'
+    b'\x20\x40\x40\x3D\x00'
+    b'\x7F\x10\x28\x44\x00'
+    b'\x00\x41\x7F\x40\x00'
+    b'\x7C\x04\x78\x04\x78'
+    b'\x7C\x08\x04\x04\x78'
+    b'\x38\x44\x44\x44\x38'
+    b'\xFC\x18\x24\x24\x18'
+    b'\x18\x24\x24\x18\xFC'
+    b'\x7C\x08\x04\x04\x08'
+    b'\x48\x54\x54\x54\x24'
+    b'\x04\x04\x3F\x44\x24'
+    b'\x3C\x40\x40\x20\x7C'
+    b'\x1C\x20\x40\x20\x1C'
+    b'\x3C\x40\x30\x40\x3C'
+    b'\x44\x28\x10\x28\x44'
+    b'\x4C\x90\x90\x90\x7C'
+    b'\x44\x64\x54\x4C\x44'
+    b'\x00\x08\x36\x41\x00'
+    b'\x00\x00\x77\x00\x00'
+    b'\x00\x41\x36\x08\x00'
+    b'\x02\x01\x02\x04\x02'
+    b'\x3C\x26\x23\x26\x3C'
+    b'\x1E\xA1\xA1\x61\x12'
+    b'\x3A\x40\x40\x20\x7A'
+    b'\x38\x54\x54\x55\x59'
+    b'\x21\x55\x55\x79\x41'
+    b'\x21\x54\x54\x78\x41'
+    b'\x21\x55\x54\x78\x40'
+    b'\x20\x54\x55\x79\x40'
+    b'\x0C\x1E\x52\x72\x12'
+    b'\x39\x55\x55\x55\x59'
+    b'\x39\x54\x54\x54\x59'
+    b'\x39\x55\x54\x54\x58'
+    b'\x00\x00\x45\x7C\x41'
+    b'\x00\x02\x45\x7D\x42'
+    b'\x00\x01\x45\x7C\x40'
+    b'\xF0\x29\x24\x29\xF0'
+    b'\xF0\x28\x25\x28\xF0'
+    b'\x7C\x54\x55\x45\x00'
+    b'\x20\x54\x54\x7C\x54'
+    b'\x7C\x0A\x09\x7F\x49'
+    b'\x32\x49\x49\x49\x32'
+    b'\x32\x48\x48\x48\x32'
+    b'\x32\x4A\x48\x48\x30'
+    b'\x3A\x41\x41\x21\x7A'
+    b'\x3A\x42\x40\x20\x78'
+    b'\x00\x9D\xA0\xA0\x7D'
+    b'\x39\x44\x44\x44\x39'
+    b'\x3D\x40\x40\x40\x3D'
+    b'\x3C\x24\xFF\x24\x24'
+    b'\x48\x7E\x49\x43\x66'
+    b'\x2B\x2F\xFC\x2F\x2B'
+    b'\xFF\x09\x29\xF6\x20'
+    b'\xC0\x88\x7E\x09\x03'
+    b'\x20\x54\x54\x79\x41'
+    b'\x00\x00\x44\x7D\x41'
+    b'\x30\x48\x48\x4A\x32'
+    b'\x38\x40\x40\x22\x7A'
+    b'\x00\x7A\x0A\x0A\x72'
+    b'\x7D\x0D\x19\x31\x7D'
+    b'\x26\x29\x29\x2F\x28'
+    b'\x26\x29\x29\x29\x26'
+    b'\x30\x48\x4D\x40\x20'
+    b'\x38\x08\x08\x08\x08'
+    b'\x08\x08\x08\x08\x38'
+    b'\x2F\x10\xC8\xAC\xBA'
+    b'\x2F\x10\x28\x34\xFA'
+    b'\x00\x00\x7B\x00\x00'
+    b'\x08\x14\x2A\x14\x22'
+    b'\x22\x14\x2A\x14\x08'
+    b'\xAA\x00\x55\x00\xAA'
+    b'\xAA\x55\xAA\x55\xAA'
+    b'\x00\x00\x00\xFF\x00'
+    b'\x10\x10\x10\xFF\x00'
+    b'\x14\x14\x14\xFF\x00'
+    b'\x10\x10\xFF\x00\xFF'
+    b'\x10\x10\xF0\x10\xF0'
+    b'\x14\x14\x14\xFC\x00'
+    b'\x14\x14\xF7\x00\xFF'
+    b'\x00\x00\xFF\x00\xFF'
+    b'\x14\x14\xF4\x04\xFC'
+    b'\x14\x14\x17\x10\x1F'
+    b'\x10\x10\x1F\x10\x1F'
+    b'\x14\x14\x14\x1F\x00'
+    b'\x10\x10\x10\xF0\x00'
+    b'\x00\x00\x00\x1F\x10'
+    b'\x10\x10\x10\x1F\x10'
+    b'\x10\x10\x10\xF0\x10'
+    b'\x00\x00\x00\xFF\x10'
+    b'\x10\x10\x10\x10\x10'
+    b'\x10\x10\x10\xFF\x10'
+    b'\x00\x00\x00\xFF\x14'
+    b'\x00\x00\xFF\x00\xFF'
+    b'\x00\x00\x1F\x10\x17'
+    b'\x00\x00\xFC\x04\xF4'
+    b'\x14\x14\x17\x10\x17'
+    b'\x14\x14\xF4\x04\xF4'
+    b'\x00\x00\xFF\x00\xF7'
+    b'\x14\x14\x14\x14\x14'
+    b'\x14\x14\xF7\x00\xF7'
+    b'\x14\x14\x14\x17\x14'
+    b'\x10\x10\x1F\x10\x1F'
+    b'\x14\x14\x14\xF4\x14'
+    b'\x10\x10\xF0\x10\xF0'
+    b'\x00\x00\x1F\x10\x1F'
+    b'\x00\x00\x00\x1F\x14'
+    b'\x00\x00\x00\xFC\x14'
+    b'\x00\x00\xF0\x10\xF0'
+    b'\x10\x10\xFF\x10\xFF'
+    b'\x14\x14\x14\xFF\x14'
+    b'\x10\x10\x10\x1F\x00'
+    b'\x00\x00\x00\xF0\x10'
+    b'\xFF\xFF\xFF\xFF\xFF'
+    b'\xF0\xF0\xF0\xF0\xF0'
+    b'\xFF\xFF\xFF\x00\x00'
+    b'\x00\x00\x00\xFF\xFF'
+    b'\x0F\x0F\x0F\x0F\x0F'
+    b'\x38\x44\x44\x38\x44'
+    b'\x7C\x2A\x2A\x3E\x14'
+    b'\x7E\x02\x02\x06\x06'
+    b'\x02\x7E\x02\x7E\x02'
+    b'\x63\x55\x49\x41\x63'
+    b'\x38\x44\x44\x3C\x04'
+    b'\x40\x7E\x20\x1E\x20'
+    b'\x06\x02\x7E\x02\x02'
+    b'\x99\xA5\xE7\xA5\x99'
+    b'\x1C\x2A\x49\x2A\x1C'
+    b'\x4C\x72\x01\x72\x4C'
+    b'\x30\x4A\x4D\x4D\x30'
+    b'\x30\x48\x78\x48\x30'
+    b'\xBC\x62\x5A\x46\x3D'
+    b'\x3E\x49\x49\x49\x00'
+    b'\x7E\x01\x01\x01\x7E'
+    b'\x2A\x2A\x2A\x2A\x2A'
+    b'\x44\x44\x5F\x44\x44'
+    b'\x40\x51\x4A\x44\x40'
+    b'\x40\x44\x4A\x51\x40'
+    b'\x00\x00\xFF\x01\x03'
+    b'\xE0\x80\xFF\x00\x00'
+    b'\x08\x08\x6B\x6B\x08'
+    b'\x36\x12\x36\x24\x36'
+    b'\x06\x0F\x09\x0F\x06'
+    b'\x00\x00\x18\x18\x00'
+    b'\x00\x00\x10\x10\x00'
+    b'\x30\x40\xFF\x01\x01'
+    b'\x00\x1F\x01\x01\x1E'
+    b'\x00\x19\x1D\x17\x12'
+    b'\x00\x3C\x3C\x3C\x3C'
+    b'\x00\x00\x00\x00\x00'
+)
+
+# Font files start with a header, followed by the glyph data:
+#   b'EF', cols, rows, first character code, 2 reserved bytes
+# Glyphs are stored back to back, each as `cols` columns of (rows + 7) // 8
+# bytes, top page first, least significant bit at the top.
+FONT_MAGIC = b'EF'
+FONT_HEADER = 6
+
+
+class Font(object):
+    def __init__(self, data, cols, rows=8, first=0):
+        """
+        Wrap column-major glyph data without copying it. `data` may be a
+        bytes constant (frozen into flash) or a buffer read from a file.
+        """
+        self.cols = cols
+        self.rows = rows
+        self.pages = (rows + 7) // 8
+        self.first = first
+        self.bytes = memoryview(data)
+        self.glyph_size = cols * self.pages
+        self.count = len(data) // self.glyph_size
+        # Pre-scaled glyph strips, filled in lazily by the Display.
+        self.strips = {}
+
+    def glyph(self, code):
+        """
+        Return the column data of a character, or None if the font lacks it.
+        """
+        index = code - self.first
+        if 0 <= index < self.count:
+            start = index * self.glyph_size
+            return self.bytes[start:start + self.glyph_size]
+        return None
+
+    @staticmethod
+    def load(path):
+        """
+        Load a font from a binary font file, e.g. Font.load('/sd/fonts/digits.fnt').
+        """
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < FONT_HEADER or data[0:2] != FONT_MAGIC:
+            raise ValueError("Not a font file: " + path)
+        return Font(memoryview(data)[FONT_HEADER:], data[2], data[3], data[4])
+
+
+class Font5x8(Font):
+    def __init__(self):
+        Font.__init__(self, FONT5X8, 5, 8)
+
+
+def expand_glyph(font, code, size):
+    """
+    Scale one glyph vertically by `size` and return it as a bytes strip of
+    font.cols * font.pages * size bytes: the page bytes of each font column,
+    top page first. Characters missing from the font come back blank.
+    """
+    pages = font.pages
+    out_pages = pages * size
+    strip = bytearray(font.cols * out_pages)
+    glyph = font.glyph(code)
+    if glyph is None:
+        return bytes(strip)
+    for col in range(font.cols):
+        mask = 0
+        for page in range(pages):
+            mask |= glyph[col * pages + page] << (page * 8)
+        bits = 0
+        for row in range(pages * 8):
+            if mask & (1 << row):
+                bits |= ((1 << size) - 1) << (row * size)
+        for page in range(out_pages):
+            strip[col * out_pages + page] = (bits >> (page * 8)) & 0xFF
+    return bytes(strip)
 
 
 class SSD1306(object):
@@ -367,11 +445,46 @@ class SSD1306(object):
             # I2C command buffer
             self.cbuffer = bytearray(2)
             self.cbuffer[0] = CTL_CMD
+            # I2C data buffer for a single page window, prefixed with CTL_DAT
+            self.tbuffer = bytearray(1 + self.columns)
+            self.tbuffer[0] = CTL_DAT
+
+        # Per-page dirty column range since the last flush, and a copy of
+        # what the panel is currently showing (None until the first flush).
+        self.dirty_lo = bytearray(self.pages)
+        self.dirty_hi = bytearray(self.pages)
+        for page in range(self.pages):
+            self.dirty_lo[page] = CLEAN
+        self.shadow = None
+        self.buffer = None
 
     def clear(self):
-        self.buffer = bytearray(self.offset + self.pages * self.columns)
-        if self.offset == 1:
-            self.buffer[0] = CTL_DAT
+        self.fill()
+        for page in range(self.pages):
+            self.dirty_lo[page] = 0
+            self.dirty_hi[page] = self.columns - 1
+
+    def fill(self, source=None):
+        """
+        Overwrite the whole frame with `source` (a pages * columns buffer,
+        e.g. a cached background) or with blank pixels. Nothing is marked
+        dirty; callers that care about the flush must do that themselves.
+        """
+        if self.buffer is None:
+            self.buffer = bytearray(self.offset + self.pages * self.columns)
+            self.blank = bytearray(self.pages * self.columns)
+            if self.offset == 1:
+                self.buffer[0] = CTL_DAT
+        memoryview(self.buffer)[self.offset:] = source or self.blank
+
+    def mark_dirty(self, page, lo, hi):
+        """
+        Record that columns lo..hi of the given page may have changed.
+        """
+        if lo < self.dirty_lo[page]:
+            self.dirty_lo[page] = lo
+        if hi > self.dirty_hi[page]:
+            self.dirty_hi[page] = hi
 
     def write_command(self, command_byte):
         if self.offset == 1:
@@ -384,21 +497,68 @@ class SSD1306(object):
     def invert_display(self, invert):
         self.write_command(INVERTDISPLAY if invert else NORMALDISPLAY)
 
-    def display(self):
+    def _set_window(self, col_lo, col_hi, page_lo, page_hi):
         self.write_command(COLUMNADDR)
-        self.write_command(0)
-        self.write_command(self.columns - 1)
+        self.write_command(col_lo)
+        self.write_command(col_hi)
         self.write_command(PAGEADDR)
-        self.write_command(0)
-        self.write_command(self.pages - 1)
+        self.write_command(page_lo)
+        self.write_command(page_hi)
+
+    def _send_page(self, page, lo, hi):
+        start = self.offset + page * self.columns
+        data = memoryview(self.buffer)[start + lo:start + hi + 1]
+        self._set_window(lo, hi, page, page)
         if self.offset == 1:
-            self.i2c.send(self.buffer, addr=self.devid, timeout=5000)
+            tbuffer = memoryview(self.tbuffer)
+            tbuffer[1:hi - lo + 2] = data
+            self.i2c.send(tbuffer[:hi - lo + 2], addr=self.devid, timeout=5000)
         else:
             self.dc.high()
-            self.spi.send(self.buffer)
+            self.spi.send(data)
+        memoryview(self.shadow)[start + lo:start + hi + 1] = data
+
+    def display(self):
+        """
+        Flush the buffer to the panel. Only the column range of each page
+        that differs from what was last sent is transferred, so an
+        unchanged frame costs no bus traffic at all.
+        """
+        if self.shadow is None:
+            # Panel RAM contents are unknown; push the whole frame once.
+            self._set_window(0, self.columns - 1, 0, self.pages - 1)
+            if self.offset == 1:
+                self.i2c.send(self.buffer, addr=self.devid, timeout=5000)
+            else:
+                self.dc.high()
+                self.spi.send(memoryview(self.buffer)[self.offset:])
+            self.shadow = bytearray(self.buffer)
+            for page in range(self.pages):
+                self.dirty_lo[page] = CLEAN
+                self.dirty_hi[page] = 0
+            return
+
+        buffer = self.buffer
+        shadow = self.shadow
+        for page in range(self.pages):
+            lo = self.dirty_lo[page]
+            if lo == CLEAN:
+                continue
+            hi = self.dirty_hi[page]
+            self.dirty_lo[page] = CLEAN
+            self.dirty_hi[page] = 0
+            start = self.offset + page * self.columns
+            # Trim the dirty range down to the bytes that actually differ.
+            while lo <= hi and buffer[start + lo] == shadow[start + lo]:
+                lo += 1
+            while hi >= lo and buffer[start + hi] == shadow[start + hi]:
+                hi -= 1
+            if lo <= hi:
+                self._send_page(page, lo, hi)
 
     def set_pixel(self, x, y, state):
         index = x + (int(y / 8) * self.columns)
+        self.mark_dirty(y >> 3, x, x)
         if state:
             self.buffer[self.offset + index] |= (1 << (y & 7))
         else:
@@ -429,6 +589,7 @@ class SSD1306(object):
         for item in data:
             self.write_command(item)
         self.clear()
+        self.shadow = None
         self.display()
 
     def poweron(self):
@@ -459,24 +620,167 @@ class Display(object):
         self.width = 128
         self.height = 64
 
+        # Cached static layers, the one the last frame started from, and the
+        # columns drawn on top of it per page (what the next frame must undo).
+        self.backgrounds = {}
+        self.background = None
+        self.changed = True
+        self.pending = False
+        pages = self.device.pages
+        self.ink_lo = bytearray(pages)
+        self.ink_hi = bytearray(pages)
+        for page in range(pages):
+            self.ink_lo[page] = CLEAN
+
     def _wait_until_ready(self):
         while not self.device.i2c.is_ready(self.device.devid):
             pass
 
+    def _begin(self, name=None):
+        """
+        Start the frame from a cached background (or a blank buffer) with a
+        single buffer copy.
+        """
+        self.pending = False
+        self.device.fill(self.backgrounds[name] if name else None)
+        if name != self.background:
+            self.changed = True
+            self.background = name
+
+    def use_background(self, name, layer):
+        """
+        Start the frame from the static layer `name`, rendering the primitives
+        yielded by `layer()` into the cache the first time it is used.
+        Must be drawn before any dynamic content of the frame.
+        """
+        if name not in self.backgrounds:
+            device = self.device
+            self.pending = False
+            device.fill()
+            for primitive in layer():
+                primitive.draw(self)
+            self.backgrounds[name] = bytes(memoryview(device.buffer)[device.offset:])
+            for page in range(device.pages):
+                device.dirty_lo[page] = CLEAN
+                device.dirty_hi[page] = 0
+        self._begin(name)
+
+    def restore(self, x, y, w, h):
+        """
+        Reset a rectangle of the current frame to its background, in whole
+        pages, and mark it for flushing.
+        """
+        device = self.device
+        x0 = max(x, 0)
+        x1 = min(x + w, self.width) - 1
+        y0 = max(y, 0)
+        y1 = min(y + h, self.height) - 1
+        if x0 > x1 or y0 > y1:
+            return
+        lo = 127 - x1
+        hi = 127 - x0
+        source = memoryview(self.backgrounds[self.background] if self.background else device.blank)
+        buffer = memoryview(device.buffer)
+        columns = device.columns
+        for page in range(y0 >> 3, (y1 >> 3) + 1):
+            start = page * columns
+            buffer[device.offset + start + lo:device.offset + start + hi + 1] = source[start + lo:start + hi + 1]
+            device.mark_dirty(page, lo, hi)
+
+    def flush(self):
+        """
+        Flush a frame patched in place with restore() and redraws, outside
+        of a `with display:` block.
+        """
+        device = self.device
+        # Columns drawn on top of the background only grow while patching;
+        # the next full frame repaints all of them.
+        for page in range(device.pages):
+            if device.dirty_lo[page] < self.ink_lo[page]:
+                self.ink_lo[page] = device.dirty_lo[page]
+            if device.dirty_lo[page] != CLEAN and device.dirty_hi[page] > self.ink_hi[page]:
+                self.ink_hi[page] = device.dirty_hi[page]
+        device.display()
+
     def set_pixel(self, x, y, state):
+        if self.pending:
+            self._begin()
         if 0 <= x < self.width and 0 <= y < self.height:
             self.device.set_pixel(127 - x, y, state)
 
-    def draw_text(self, x, y, string, size=1, space=1):
-        font_bytes = self.device.font.bytes
-        font_cols = self.device.font.cols
+    def glyph_strip(self, font, code, size):
+        """
+        Return the cached, pre-scaled column bytes for a character. Each
+        font column becomes font.pages * size bytes, top page first.
+        """
+        key = code * 4 + size
+        strip = font.strips.get(key)
+        if strip is None:
+            strip = expand_glyph(font, code, size)
+            font.strips[key] = strip
+        return strip
+
+    def draw_text(self, x, y, string, size=1, space=1, font=None):
+        if self.pending:
+            self._begin()
+        font = font or self.device.font
+        if y < 0 or size > 3:
+            self._draw_text_pixels(x, y, string, size, space, font)
+            return
+        device = self.device
+        buffer = device.buffer
+        columns = device.columns
+        pages = device.pages
+        font_cols = font.cols
+        strip_pages = font.pages * size
+        shift = y & 7
+        page0 = y >> 3
+        lo_mask = ~((0xFF << shift) & 0xFF)
+        hi_mask = ~(0xFF >> (8 - shift))
+        last_page = page0 + strip_pages if shift else page0 + strip_pages - 1
+        if last_page >= pages:
+            last_page = pages - 1
+        x_start = x
+        for c in string:
+            strip = self.glyph_strip(font, ord(c), size)
+            i = 0
+            for col in range(font_cols):
+                for sx in range(size):
+                    if 0 <= x < self.width:
+                        base = device.offset + 127 - x
+                        page = page0
+                        for p in range(strip_pages):
+                            if page >= pages:
+                                break
+                            b = strip[i + p]
+                            index = base + page * columns
+                            buffer[index] = (buffer[index] & lo_mask) | ((b << shift) & 0xFF)
+                            if shift and page + 1 < pages:
+                                index += columns
+                                buffer[index] = (buffer[index] & hi_mask) | (b >> (8 - shift))
+                            page += 1
+                    x += 1
+                i += strip_pages
+            x += space
+        # Mark the touched device columns (mirrored) on every touched page.
+        lo = 127 - min(x - 1, self.width - 1)
+        hi = 127 - max(x_start, 0)
+        if lo <= hi:
+            for page in range(page0, last_page + 1):
+                device.mark_dirty(page, lo, hi)
+
+    def _draw_text_pixels(self, x, y, string, size, space, font):
+        rows = font.pages * 8
         for c in string:
-            p = ord(c) * font_cols
-            for col in range(0, font_cols):
-                mask = font_bytes[p]
-                p += 1
+            strip = self.glyph_strip(font, ord(c), 1)
+            p = 0
+            for col in range(0, font.cols):
+                mask = 0
+                for page in range(font.pages):
+                    mask |= strip[p] << (page * 8)
+                    p += 1
                 py = y
-                for row in range(0, 8):
+                for row in range(0, rows):
                     for sy in range(0, size):
                         px = x
                         for sx in range(0, size):
@@ -488,8 +792,26 @@ class Display(object):
             x += space
 
     def __enter__(self):
-        self.device.clear()
+        # The buffer is reset lazily by the first draw (or background) of
+        # the frame, so a background costs one copy rather than two.
+        self.pending = True
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.device.display()
+        if self.pending:
+            self._begin()
+        device = self.device
+        # Whatever was drawn this frame sits on top of the background and
+        # must be repainted next frame; whatever was drawn last frame was
+        # just wiped by the background copy and must be flushed now.
+        for page in range(device.pages):
+            lo = self.ink_lo[page]
+            hi = self.ink_hi[page]
+            self.ink_lo[page] = device.dirty_lo[page]
+            self.ink_hi[page] = device.dirty_hi[page]
+            if self.changed:
+                device.mark_dirty(page, 0, device.columns - 1)
+            elif lo != CLEAN:
+                device.mark_dirty(page, lo, hi)
+        self.changed = False
+        device.display()
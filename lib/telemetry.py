@@ -0,0 +1,167 @@
+"""
+Fixed size telemetry ring buffer for the control loop.
+
+All storage is allocated up front, in arrays, when the buffer is made:
+SAMPLE_BYTES (37) bytes per sample, i.e. nbytes == capacity * 37. Once
+it's full, each new sample overwrites the oldest one. Recording a sample
+only stores numbers into the arrays, so it never allocates:
+
+>>> log = Telemetry(capacity=600)
+>>> log.record(pyb.millis(), temp, set_point, p, i, d, output, duty, ff, flags)
+
+Each sample holds a ms timestamp, the FIELDS as 32 bit floats, and a
+byte of FLAG_* bits for the switches. Readers iterate samples() or
+export() step by step between control tasks: a sample that gets
+overwritten while they are at it is skipped, never returned torn.
+
+Samples can also be streamed live over the USB serial port as they are
+recorded; tools/telemetry_recorder.py decodes the stream on the host:
+
+>>> log = Telemetry(capacity=300, stream=TelemetryStream())
+
+Each frame is SYNC, a sequence number byte, the sample packed as
+SAMPLE_FORMAT, and the Dallas CRC8 of the sequence number and sample.
+"""
+
+import pyb
+import struct
+from array import array
+from Espyresso.lib.onewire import crc8
+
+FIELDS = ('temp', 'set_point', 'p', 'i', 'd', 'output', 'duty', 'feed_forward')
+N_FIELDS = len(FIELDS)
+SAMPLE_BYTES = 4 + 4 * N_FIELDS + 1
+SAMPLE_FORMAT = '<I8fB'
+
+SYNC = b'\xaa\x55'
+FRAME_BYTES = len(SYNC) + 1 + SAMPLE_BYTES + 1
+
+# Switch state bits
+FLAG_SHOT = 0x01
+FLAG_STEAM = 0x02
+FLAG_AUTOTUNE = 0x04
+FLAG_NO_SENSOR = 0x08
+
+# Recorded for a temperature when there's no reading
+NAN = float('nan')
+
+
+class TelemetryStream(object):
+    """
+    Send samples as binary frames over USB (pyb.USB_VCP). Sending never
+    waits: when the host is slow, or not there, the frame is dropped (or
+    cut short, which the decoder detects) and counted in `dropped`.
+    """
+    def __init__(self, port=None):
+        self.port = port or pyb.USB_VCP()
+        self.frame = bytearray(FRAME_BYTES)
+        self.frame[0] = SYNC[0]
+        self.frame[1] = SYNC[1]
+        # The part covered by the CRC, sliced once so sending doesn't allocate
+        self.body = memoryview(self.frame)[2:-1]
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, time, temp, set_point, p, i, d, output, duty, feed_forward, flags):
+        self.seq = (self.seq + 1) & 0xFF
+        if not self.port.isconnected():
+            self.dropped += 1
+            return
+        frame = self.frame
+        frame[2] = self.seq
+        struct.pack_into(SAMPLE_FORMAT, frame, 3, time, temp, set_point, p, i, d, output, duty, feed_forward,
+                         flags)
+        frame[FRAME_BYTES - 1] = crc8(self.body)
+        if self.port.send(frame, timeout=0) == FRAME_BYTES:
+            self.sent += 1
+        else:
+            self.dropped += 1
+
+
+class Telemetry(object):
+    def __init__(self, capacity=600, period=1000, stream=None):
+        # Recording period (ms) for the controller's telemetry task
+        self.period = period
+        # Optional TelemetryStream every sample is sent to as it's recorded
+        self.stream = stream
+        self.capacity = capacity
+        self.times = array('I', range(capacity))
+        self.values = array('f', range(capacity * N_FIELDS))
+        self.flags = array('B', range(capacity))
+        # Samples recorded so far; the next one goes to total % capacity.
+        self.total = 0
+
+    @property
+    def nbytes(self):
+        return self.capacity * SAMPLE_BYTES
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def record(self, time, temp, set_point, p, i, d, output, duty, feed_forward, flags):
+        slot = self.total % self.capacity
+        self.times[slot] = time
+        values = self.values
+        j = slot * N_FIELDS
+        values[j] = temp
+        values[j + 1] = set_point
+        values[j + 2] = p
+        values[j + 3] = i
+        values[j + 4] = d
+        values[j + 5] = output
+        values[j + 6] = duty
+        values[j + 7] = feed_forward
+        self.flags[slot] = flags
+        self.total += 1
+        if self.stream is not None:
+            self.stream.send(time, temp, set_point, p, i, d, output, duty, feed_forward, flags)
+
+    def sample(self, index):
+        """
+        Return sample number `index` (counting from the first ever
+        recorded) as (time, values, flags), or None if it has been
+        overwritten or not recorded yet.
+        """
+        if index < self.total - self.capacity or index >= self.total:
+            return None
+        slot = index % self.capacity
+        j = slot * N_FIELDS
+        return self.times[slot], self.values[j:j + N_FIELDS], self.flags[slot]
+
+    def snapshot(self):
+        """
+        Return the range of sample numbers in the buffer right now, for
+        sample() or samples().
+        """
+        return max(0, self.total - self.capacity), self.total
+
+    def samples(self, start=None, stop=None):
+        """
+        Iterate the samples from `start` to `stop` (default: everything
+        in the buffer when called), oldest first. Samples overwritten
+        before they are reached are skipped.
+        """
+        first, last = self.snapshot()
+        if start is None or start < first:
+            start = first
+        if stop is None:
+            stop = last
+        for index in range(start, stop):
+            sample = self.sample(index)
+            if sample is not None:
+                yield sample
+
+    def export(self, file, rows=20):
+        """
+        Write the buffer to an open file as CSV, `rows` rows per step. This
+        is a generator: the controller drives it with next() from a task,
+        so control keeps running between steps.
+        """
+        file.write('time,' + ','.join(FIELDS) + ',flags\n')
+        n = 0
+        for time, values, flags in self.samples():
+            file.write(str(time) + ',' + ','.join(str(value) for value in values) + ',' + str(flags) + '\n')
+            n += 1
+            if n % rows == 0:
+                yield n
@@ -5,7 +5,9 @@ import machine
 import micropython
 from Espyresso.lib.ssd1306 import Display
 from Espyresso.lib.inputs import Switch
-from Espyresso.lib.engine import Controller, rectangle, text, format_temp
+from Espyresso.lib.outputs import TimeProportional
+from Espyresso.lib.telemetry import Telemetry, TelemetryStream
+from Espyresso.lib.engine import Controller, rectangle, text, background, format_temp
 
 micropython.alloc_emergency_exception_buf(100)
 DEFAULT_SET_TEMP = 200
@@ -18,46 +20,72 @@ SHOT = 1
 STEAM = 0
 
 
+# Static layers:
+def main_labels():
+    yield from text(x=0, y=0, string='Temp:', size=2)
+    yield from text(x=0, y=30, string='Set:', size=3)
+
+
+def shot_labels():
+    yield from text(x=0, y=0, string='Temp:', size=2)
+    yield from text(x=0, y=30, string='Time:', size=3)
+    yield from text(x=0, y=56, string='Boost:', size=1)
+
+
+def tune_labels():
+    yield from text(x=0, y=0, string='Temp:', size=2)
+    yield from text(x=0, y=30, string='Tune', size=2)
+
+
 # Views:
 def main_screen(w, h, set_temp, current_temp):
-    yield from text(x=0, y=0, string='Temp:', size=2)
+    yield from background('main', main_labels)
     yield from text(x=60, y=0, string=current_temp, size=2)
-    yield from text(x=0, y=30, string='Set:', size=3)
     yield from text(x=65, y=30, string=set_temp, size=3)
 
 
-def shot_timer(w, h, t, current_temp):
-    yield from text(x=0, y=0, string='Temp:', size=2)
+def shot_timer(w, h, t, current_temp, boost):
+    yield from background('shot', shot_labels)
     yield from text(x=60, y=0, string=current_temp, size=2)
-    yield from text(x=0, y=30, string='Time:', size=3)
     yield from text(x=80, y=30, string=t, size=3)
+    yield from text(x=40, y=56, string=boost, size=1)
+
+
+def autotune_screen(w, h, progress, current_temp):
+    yield from background('tune', tune_labels)
+    yield from text(x=60, y=0, string=current_temp, size=2)
+    yield from text(x=64, y=30, string=str(progress) + '%', size=3)
 
 
 def view(state):
-    if state['state'] == PUMP_ON:
-        yield from shot_timer(w=state['display']['width'],
-                              h=state['display']['height'],
-                              t=str(round((pyb.elapsed_millis(state['start_time'])) / 1000)),
-                              current_temp=format_temp(state['boiler_temp'], 1))
+    w = state.display['width']
+    h = state.display['height']
+    if state.autotune is not None:
+        yield from autotune_screen(w=w,
+                                   h=h,
+                                   progress=state.autotune,
+                                   current_temp=format_temp(state.boiler_temp, 1))
+    elif state.state == PUMP_ON:
+        yield from shot_timer(w=w,
+                              h=h,
+                              t=str(round((pyb.elapsed_millis(state.start_time)) / 1000)),
+                              current_temp=format_temp(state.boiler_temp, 1),
+                              boost=str(state.feed_forward) + '%')
     else:
-        if state['mode'] == SHOT:
-            yield from main_screen(w=state['display']['width'],
-                                   h=state['display']['height'],
-                                   set_temp=format_temp(state['set_temp'], 0),
-                                   current_temp=format_temp(state['boiler_temp'], 1))
+        if state.mode == SHOT:
+            yield from main_screen(w=w,
+                                   h=h,
+                                   set_temp=format_temp(state.set_temp, 0),
+                                   current_temp=format_temp(state.boiler_temp, 1))
         else:
-            yield from main_screen(w=state['display']['width'],
-                                   h=state['display']['height'],
-                                   set_temp=format_temp(state['steam_temp'], 0),
-                                   current_temp=format_temp(state['boiler_temp'], 1))
+            yield from main_screen(w=w,
+                                   h=h,
+                                   set_temp=format_temp(state.steam_temp, 0),
+                                   current_temp=format_temp(state.boiler_temp, 1))
 
 
+# The state is updated in place; nothing to do between input and display yet.
 def controller(state):
-    if state['state'] == PUMP_OFF:
-        state['state'] = PUMP_OFF
-    elif state['state'] == PUMP_ON:
-        state['state'] = PUMP_ON
-    state.update()
     return state
 
 
@@ -77,7 +105,11 @@ pid_controller = Controller(display=Display(pinout={'sda': 'Y10',
                             up_pin='X9',
                             down_pin='X10',
                             shot_switch=Switch('X11'),
-                            steam_switch=Switch('Y8'))
+                            steam_switch=Switch('Y8'),
+                            heater=TimeProportional('Y7', timer=2, window=1000),
+                            # Last 5 minutes at 1 s: 300 * 37 = 11100 bytes, also
+                            # streamed over USB (tools/telemetry_recorder.py)
+                            telemetry=Telemetry(capacity=300, period=1000, stream=TelemetryStream()))
 
 
 if __name__ == '__main__':
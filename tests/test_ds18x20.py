@@ -0,0 +1,11 @@
+import hostenv
+from Espyresso.lib.ds18x20 import DS18X20
+
+
+def test_empty_bus():
+    # Nothing pulls the bus low: no presence pulse, no devices
+    sensor = DS18X20(hostenv.Pin())
+    assert sensor.roms == []
+    sensor.start_conversions()
+    assert not sensor.converting
+    assert sensor.read_temps() == []
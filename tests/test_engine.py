@@ -0,0 +1,180 @@
+import pytest
+
+import hostenv
+import Espyresso.lib.engine as engine
+from Espyresso.lib.scheduler import Scheduler
+from Espyresso.lib.outputs import TimeProportional
+from Espyresso.lib.ssd1306 import Display
+
+INITIAL_STATE = {'state': 0, 'mode': 1, 'start_time': 0, 'set_temp': 200, 'steam_temp': 240,
+                 'max_temp': 250, 'boiler_temp': 0}
+# Before make_controller stubs it out
+START_AUTOTUNE = engine.Controller.start_autotune
+
+
+class FakeSensor(object):
+    """
+    Returns the queued readings; OSError stands for a failed (CRC) read.
+    """
+    def __init__(self, pin, cache=None):
+        self.readings = []
+
+    def set_fast(self, fast):
+        pass
+
+    def poll_f(self):
+        reading = self.readings.pop(0) if self.readings else None
+        if reading is OSError:
+            raise OSError("CRC mismatch")
+        return reading
+
+
+class FakeSwitch(object):
+    on = 0
+
+
+class RecordingFilter(object):
+    value = None
+
+    def __init__(self):
+        self.calls = []
+
+    def reset(self, value):
+        self.calls.append(('reset', value))
+        self.value = value
+
+    def update(self, measurement, dt, u=0):
+        self.calls.append((measurement, dt, u))
+        self.value = measurement + 1
+        return self.value
+
+
+def make_controller(monkeypatch, tmp_path, view=lambda state: [], temp_filter=None):
+    monkeypatch.setattr(engine, 'DS18X20', FakeSensor)
+    monkeypatch.setattr(engine.settings_log, 'path', str(tmp_path / 'settings.log'))
+    monkeypatch.setattr(engine.settings_log, 'tmp_path', str(tmp_path / 'settings.tmp'))
+    # Both set buttons read high on the host; don't autotune.
+    monkeypatch.setattr(engine.Controller, 'start_autotune', lambda self: None)
+    display = Display(pinout={'sda': 'Y10', 'scl': 'Y9'}, height=64, external_vcc=False)
+    return engine.Controller(display, INITIAL_STATE, lambda state: state, view,
+                             'X9', 'X10', FakeSwitch(), FakeSwitch(),
+                             heater=TimeProportional('Y7'), temp_filter=temp_filter)
+
+
+def start(monkeypatch, tmp_path, **kwargs):
+    monkeypatch.setattr(Scheduler, 'run', lambda scheduler: None)
+    controller = make_controller(monkeypatch, tmp_path, **kwargs)
+    controller.run()
+    return controller
+
+
+def test_no_heat_before_first_reading(monkeypatch, tmp_path):
+    controller = start(monkeypatch, tmp_path)
+    controller._sample()
+    controller._regulate()
+    assert controller.output == 0
+    assert controller.heater.duty == 0
+
+
+def test_no_heat_on_frozen_reading(monkeypatch, tmp_path):
+    controller = start(monkeypatch, tmp_path)
+    controller.sensor.readings = [150.0]
+    controller._sample()
+    controller._regulate()
+    assert controller.output > 0
+
+    # Probe gone: every read fails its CRC and the last value stays on screen.
+    controller.sensor.readings = [OSError] * 100
+    hostenv.advance(engine.SENSOR_TIMEOUT * 1000 // 2)
+    controller._sample()
+    controller._regulate()
+    assert controller.output > 0
+    hostenv.advance(engine.SENSOR_TIMEOUT * 1000)
+    controller._sample()
+    controller._regulate()
+    assert engine.state.boiler_temp == 150.0
+    assert controller.output == 0
+    assert controller.heater.duty == 0
+
+
+def test_heater_off_when_loop_crashes(monkeypatch, tmp_path):
+    frames = []
+
+    def view(state):
+        frames.append(controller.heater.duty)
+        if len(frames) == 5:
+            raise TypeError("view bug")
+        return []
+
+    controller = make_controller(monkeypatch, tmp_path, view)
+    controller.sensor.readings = [150.0] * 100
+    with pytest.raises(TypeError):
+        controller.run()
+    # It was heating when the view raised...
+    assert frames[-1] > 0
+    # ...and the timer, which keeps running, no longer switches the SSR on.
+    heater = controller.heater
+    assert heater.duty == 0
+    for _ in range(heater.window_ticks * 2):
+        heater.timer.fire()
+        assert heater.pin.value() == 0
+
+
+def test_autotune_tunes_warmup(monkeypatch, tmp_path):
+    controller = start(monkeypatch, tmp_path)
+    engine.state.mode = 1  # brew
+    START_AUTOTUNE(controller)
+    tuner = controller.tuner
+    tuner.periods = [200000] * tuner.cycles
+    tuner.amplitudes = [2.0] * tuner.cycles
+    kp, ki, kd = tuner.gains(engine.PID_PERIOD)
+    controller.sensor.readings = [150.0]
+    controller._sample()
+    controller._regulate()
+    assert controller.tuner is None
+    # Far below the set point: the warm-up runs on the tuned gains too.
+    assert engine.select_profile(engine.state, 150.0) == 'warmup'
+    for name in ('brew', 'idle', 'warmup'):
+        profile = engine.pid.profiles[name]
+        assert (profile.p, profile.i, profile.d) == (kp, ki, kd)
+
+
+def test_autotune_gives_up(monkeypatch, tmp_path):
+    controller = start(monkeypatch, tmp_path)
+    START_AUTOTUNE(controller)
+    stock = engine.pid.profiles['brew']
+    # The boiler never gets past the relay's upper switching point.
+    for minutes in range(61):
+        hostenv.advance(60 * 1000000)
+        controller.sensor.readings = [150.0]
+        controller._sample()
+        controller._regulate()
+    assert controller.tuner is None
+    assert engine.state.autotune is None
+    assert engine.pid.profiles['brew'] is stock
+
+
+def test_filter_steps_once_per_reading(monkeypatch, tmp_path):
+    controller = start(monkeypatch, tmp_path, temp_filter=RecordingFilter())
+    temp_filter = controller.temp_filter
+    controller.sensor.readings = [150.0]
+    controller._sample()
+    assert temp_filter.calls == [('reset', 150.0)]
+    # Three PID ticks, and the sensor polled in between, before the next reading
+    outputs = []
+    for _ in range(3):
+        hostenv.advance(engine.PID_PERIOD * 1000)
+        controller._sample()
+        controller._regulate()
+        outputs.append(controller.output)
+    assert len(temp_filter.calls) == 1
+    # The PID is handed the filter's estimate
+    assert engine.pid.last_temp == 150.0
+    controller.sensor.readings = [151.0]
+    controller._sample()
+    measurement, dt, u = temp_filter.calls[-1]
+    assert measurement == 151.0
+    assert dt == pytest.approx(3 * engine.PID_PERIOD / 1000)
+    assert u == pytest.approx(sum(outputs) / 3)
+    controller._regulate()
+    assert engine.pid.last_temp == 152.0
@@ -0,0 +1,193 @@
+import pytest
+
+import pyb
+import hostenv
+from Espyresso.lib.onewire import OneWire, PinBackend, UARTBackend
+
+# Times (us) from the DS18B20 datasheet
+RESET_LOW = 480
+PRESENCE_WAIT = 15, 60      # device answers this long after release...
+PRESENCE_PULSE = 60, 240    # ...and holds the bus low this long
+DEVICE_SAMPLE = 15, 60      # device samples a write slot in this window
+MASTER_SAMPLE = 15          # a read slot is valid up to here
+
+
+class BusPin(hostenv.Pin):
+    """
+    Pin on a simulated bus with one device: records every level the master
+    drives, with the simulated time, and answers reads like a DS18B20
+    would (presence after a reset pulse, then the queued bits in read slots).
+    """
+    def __init__(self, present=True, bits=()):
+        hostenv.Pin.__init__(self)
+        self.present = present
+        self.bits = list(bits)
+        self.edges = []
+        self.samples = []
+
+    def value(self, *level):
+        now = hostenv.clock[0]
+        if level:
+            self.edges.append((now, level[0]))
+            self.level = level[0]
+            return self.level
+        self.samples.append(now)
+        if self.level == 0 or len(self.edges) < 2:
+            return self.level
+        low, high = self.edges[-2][0], self.edges[-1][0]
+        if high - low >= RESET_LOW:
+            # Presence pulse: only [60, 75) us after release is low for
+            # every device within the datasheet's timing.
+            since = now - high
+            return 0 if self.present and PRESENCE_WAIT[1] <= since < PRESENCE_WAIT[0] + PRESENCE_PULSE[0] else 1
+        if now - low < MASTER_SAMPLE and self.bits:
+            return self.bits.pop(0)
+        return 1
+
+
+def slots(edges):
+    """
+    Pair falling and rising edges into (start, time held low).
+    """
+    result = []
+    for (t0, level0), (t1, level1) in zip(edges, edges[1:]):
+        if level0 == 0 and level1 == 1:
+            result.append((t0, t1 - t0))
+    return result
+
+
+def make_pin_bus(**kwargs):
+    pin = BusPin(**kwargs)
+    backend = PinBackend(pin)
+    pin.edges = []
+    return pin, OneWire(pin, backend)
+
+
+def test_pin_reset_framing():
+    pin, ow = make_pin_bus()
+    assert ow.reset()
+    (start, low), = slots(pin.edges)
+    assert low >= RESET_LOW
+    released = start + low
+    # Presence sampled while the device holds the bus low
+    presence = pin.samples[-1] - released
+    assert PRESENCE_WAIT[1] <= presence < PRESENCE_WAIT[0] + PRESENCE_PULSE[0]
+    # Whole reset/presence sequence takes at least 480 us after release
+    assert hostenv.clock[0] - released >= RESET_LOW
+
+    pin, ow = make_pin_bus(present=False)
+    assert not ow.reset()
+
+
+def test_pin_write_slots():
+    pin, ow = make_pin_bus()
+    ow.write_byte(0xA5)
+    bits = []
+    previous_end = None
+    for start, low in slots(pin.edges):
+        if low < DEVICE_SAMPLE[0]:
+            bits.append(1)
+        else:
+            # Held low through the device's typical sampling point
+            assert low >= 30
+            bits.append(0)
+        if previous_end is not None:
+            assert start - previous_end >= 1  # recovery between slots
+        previous_end = start + low
+    assert len(bits) == 8
+    assert sum(bit << i for i, bit in enumerate(bits)) == 0xA5
+
+
+def test_pin_read_slots():
+    value = 0x3C
+    pin, ow = make_pin_bus(bits=[(value >> i) & 1 for i in range(8)])
+    assert ow.read_byte() == value
+    read_slots = slots(pin.edges)
+    assert len(read_slots) == 8
+    for (start, low), sample in zip(read_slots, pin.samples):
+        assert low < MASTER_SAMPLE
+        assert sample - start < MASTER_SAMPLE
+
+
+class BusUART(hostenv.UART):
+    """
+    UART with TX/RX tied to a bus with one device (Maxim AN214): every byte
+    sent is echoed, with the bits the device pulls low cleared.
+    """
+    device = None
+
+    def __init__(self, bus):
+        hostenv.UART.__init__(self, bus)
+        self.echo = bytearray()
+        BusUART.device = self
+
+    def any(self):
+        return len(self.echo)
+
+    def write(self, buf):
+        hostenv.UART.write(self, buf)
+        for byte in bytes(buf):
+            if self.baudrate == 9600:
+                # Reset: presence pulse shows up in the echo's high bits
+                self.echo.append(0xE0 if self.present else byte)
+            elif byte == 0xFF and self.bits:
+                self.echo.append(0xFF if self.bits.pop(0) else 0xFE)
+            else:
+                self.echo.append(byte)
+        return len(buf)
+
+    def read(self, n=None):
+        n = len(self.echo) if n is None else n
+        data = bytes(self.echo[:n])
+        del self.echo[:n]
+        return data or None
+
+    def readinto(self, buf, n=None):
+        n = min(len(buf) if n is None else n, len(self.echo))
+        buf[:n] = self.echo[:n]
+        del self.echo[:n]
+        return n or None  # None on timeout, as MicroPython
+
+
+def make_uart_bus(monkeypatch, present=True, bits=()):
+    monkeypatch.setattr(pyb, 'UART', BusUART)
+    backend = UARTBackend(4)
+    uart = BusUART.device
+    uart.present = present
+    uart.bits = list(bits)
+    return uart, OneWire(None, backend)
+
+
+def test_uart_reset_framing(monkeypatch):
+    uart, ow = make_uart_bus(monkeypatch)
+    assert ow.reset()
+    # One 0xF0 at 9600 baud, then back to 115200 for the time slots
+    assert uart.written == [(9600, b'\xf0')]
+    assert uart.baudrate == 115200
+
+    uart, ow = make_uart_bus(monkeypatch, present=False)
+    assert not ow.reset()
+
+
+def test_uart_write_slots(monkeypatch):
+    uart, ow = make_uart_bus(monkeypatch)
+    ow.write_byte(0xA5)
+    # One UART byte per slot, LSB first: 0xFF writes a 1, 0x00 a 0
+    assert uart.written == [(115200, b'\xff\x00\xff\x00\x00\xff\x00\xff')]
+
+
+def test_uart_read_slots(monkeypatch):
+    value = 0x3C
+    uart, ow = make_uart_bus(monkeypatch, bits=[(value >> i) & 1 for i in range(8)])
+    assert ow.read_byte() == value
+    assert uart.written == [(115200, b'\xff' * 8)]
+
+
+def test_uart_without_echo_raises(monkeypatch):
+    uart, ow = make_uart_bus(monkeypatch)
+    # RX not tied to the bus: nothing comes back
+    monkeypatch.setattr(uart, 'write', lambda buf: hostenv.UART.write(uart, buf))
+    with pytest.raises(OSError):
+        ow.read_bytes(2)
+    with pytest.raises(OSError):
+        ow.write_byte(0xA5)
@@ -0,0 +1,90 @@
+import pytest
+
+import sim_step
+from Espyresso.lib.PID import PIDController, Profile, to_fixed
+
+DT = 200000
+# P and D alike, only the integral gain differs
+NO_I = Profile(p=2.0, i=0.0, d=1.0)
+WITH_I = Profile(p=2.0, i=0.05, d=1.0)
+
+
+def make_pid(fixed):
+    pid = PIDController(set_temp=200, fixed=fixed, d_on_measurement=True, out_min=-1000, out_max=1000)
+    pid.add_profile('a', NO_I)
+    pid.add_profile('b', WITH_I)
+    return pid
+
+
+def step(pid, temp):
+    fixed = pid.fixed
+    out = pid.update(to_fixed(temp) if fixed else temp, DT)
+    return out / 256 if fixed else out
+
+
+@pytest.mark.parametrize('fixed', [False, True])
+def test_switch_to_integrating_profile_is_bumpless(fixed):
+    pid = make_pid(fixed)
+    pid.use_profile('b')
+    # 20 steps: the integral stays clear of i_max
+    for _ in range(20):
+        before = step(pid, 190)
+    pid.use_profile('a')
+    after = step(pid, 190)
+    # The integral's contribution is held as a bias, not dropped...
+    assert after == pytest.approx(before, abs=0.1)
+    # ...and isn't integrated further while ki == 0.
+    for _ in range(50):
+        assert step(pid, 190) == pytest.approx(after, abs=0.1)
+    pid.use_profile('b')
+    back = step(pid, 190)
+    # Only one more step of integration (ki * error) on switching back
+    assert back - after == pytest.approx(WITH_I.i * 10, abs=0.1)
+
+
+@pytest.mark.parametrize('fixed', [False, True])
+def test_no_windup_while_ki_is_zero(fixed):
+    pid = make_pid(fixed)
+    pid.use_profile('a')
+    for _ in range(200):
+        before = step(pid, 190)
+    pid.use_profile('b')
+    after = step(pid, 190)
+    # Nothing accumulated under ki == 0, so no step when ki appears
+    assert after - before == pytest.approx(WITH_I.i * 10, abs=0.1)
+
+
+@pytest.mark.parametrize('mode', ['conditional', 'back'])
+def test_warm_up_step_response(mode):
+    temps = sim_step.step_response(mode)
+    wound_up = sim_step.step_response(None)
+    assert sim_step.overshoot(temps) < 10
+    assert sim_step.settling_time(temps) < 600
+    assert sim_step.overshoot(wound_up) > 5 * sim_step.overshoot(temps)
+
+
+def test_fixed_integral_keeps_small_ki():
+    # A typical autotuned boiler ki, below Q8's 1/256
+    outputs = []
+    for fixed in (False, True):
+        pid = PIDController(p=0.0, i=0.003, d=0.0, set_temp=200, fixed=fixed, out_min=-1000, out_max=1000)
+        for _ in range(40):
+            out = step(pid, 190)
+        outputs.append(out)
+    assert outputs[0] == pytest.approx(0.003 * 10 * 40)
+    assert outputs[1] == pytest.approx(outputs[0], rel=0.02)
+
+
+def test_fixed_gain_below_resolution_raises():
+    with pytest.raises(ValueError):
+        PIDController(p=0.001, fixed=True)
+    with pytest.raises(ValueError):
+        PIDController(i=1e-6, fixed=True)
+    PIDController(p=0.001, i=1e-6, fixed=False)
+
+
+@pytest.mark.parametrize('fixed', [False, True])
+def test_zero_dt(fixed):
+    pid = make_pid(fixed)
+    step(pid, 190)
+    pid.update(to_fixed(191) if fixed else 191, 0)
@@ -0,0 +1,56 @@
+from Espyresso.lib.ssd1306 import Display, COLUMNADDR, PAGEADDR
+
+SIZE = 2
+# Width of one size 2 character, and device column of screen x (mirrored)
+CHAR = 5 * SIZE + 1
+
+
+def device_col(x):
+    return 127 - x
+
+
+def make_display():
+    display = Display(pinout={'sda': 'Y10', 'scl': 'Y9'}, height=64, external_vcc=False)
+    with display:
+        display.draw_text(0, 0, 'Temp: 200', SIZE)
+    return display, display.device.i2c
+
+
+def windows(sent):
+    """
+    Split I2C traffic into (columns, pages, data bytes) per window set.
+    """
+    commands = [data[1] for data in sent if data[0] == 0x80]
+    data = [len(data) - 1 for data in sent if data[0] == 0x40]
+    result = []
+    for i in range(0, len(commands), 6):
+        assert commands[i] == COLUMNADDR and commands[i + 3] == PAGEADDR
+        result.append(((commands[i + 1], commands[i + 2]), (commands[i + 4], commands[i + 5])))
+    return list(zip(result, data))
+
+
+def test_unchanged_frame_sends_nothing():
+    display, i2c = make_display()
+    before = i2c.nbytes
+    with display:
+        display.draw_text(0, 0, 'Temp: 200', SIZE)
+    assert i2c.nbytes == before
+
+
+def test_digit_change_sends_only_its_window():
+    display, i2c = make_display()
+    before = len(i2c.sent)
+    with display:
+        display.draw_text(0, 0, 'Temp: 201', SIZE)
+    sent = i2c.sent[before:]
+
+    # The last character of the string, on the two pages of size 2 text
+    x = 8 * CHAR
+    lo, hi = device_col(x + 5 * SIZE - 1), device_col(x)
+    result = windows(sent)
+    assert [pages for (cols, pages), n in result] == [(0, 0), (1, 1)]
+    for (cols, pages), n in result:
+        assert lo <= cols[0] <= cols[1] <= hi
+        assert n == cols[1] - cols[0] + 1
+    # Far less than the 1024 bytes of a full frame
+    assert sum(len(data) for data in sent) < 2 * (6 * 2 + 1 + CHAR)
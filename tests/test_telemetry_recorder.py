@@ -0,0 +1,101 @@
+import csv
+import os
+import pty
+import threading
+import tty
+
+import telemetry_recorder
+from Espyresso.lib.telemetry import TelemetryStream
+
+TEXT = b'boiler 150.5\r\nheater on\r\n'
+
+
+class PtyPort(object):
+    """
+    USB_VCP stand-in writing to a pty master. `room` limits how much of the
+    next frame fits, as when the host is slow to read; `connected` False
+    stands for no host at all.
+    """
+    def __init__(self, fd):
+        self.fd = fd
+        self.connected = True
+        self.room = None
+
+    def isconnected(self):
+        return self.connected
+
+    def send(self, buf, timeout=None):
+        data = bytes(buf) if self.room is None else bytes(buf)[:self.room]
+        self.room = None
+        return os.write(self.fd, data)
+
+
+def sample(n):
+    # Values exact in 32 bit floats, so they survive the round trip
+    return (1000 * n, 150.5 + n, 200.0, 2.5, 0.25, -1.0, 12.5, 0.5, 0.0, n & 0x0F)
+
+
+def send_session(port):
+    """
+    Stream samples 1-7 with text printed in between, sample 3 cut short
+    and sample 5 dropped for want of a host. Returns the samples that
+    should come out the other end.
+    """
+    stream = TelemetryStream(port)
+    stream.send(*sample(1))
+    os.write(port.fd, TEXT)
+    stream.send(*sample(2))
+    port.room = 10
+    stream.send(*sample(3))
+    stream.send(*sample(4))
+    os.write(port.fd, TEXT)
+    port.connected = False
+    stream.send(*sample(5))
+    port.connected = True
+    stream.send(*sample(6))
+    stream.send(*sample(7))
+    assert stream.sent == 5
+    assert stream.dropped == 2
+    return [sample(n) for n in (1, 2, 4, 6, 7)]
+
+
+def read_rows(path):
+    with open(path) as file:
+        rows = list(csv.reader(file))
+    assert tuple(rows[0]) == telemetry_recorder.COLUMNS
+    return [(int(row[0]),) + tuple(float(value) for value in row[1:-1]) + (int(row[-1]),) for row in rows[1:]]
+
+
+def record_in_thread(*args, **kwargs):
+    thread = threading.Thread(target=telemetry_recorder.record, args=args, kwargs=kwargs, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_record_from_pty(tmp_path, capsys):
+    master, slave = pty.openpty()
+    try:
+        # Raw before anything is written, so the line discipline leaves the
+        # bytes alone (the recorder only sets it when it opens the port).
+        tty.setraw(slave)
+        expected = send_session(PtyPort(master))
+        output = str(tmp_path / 'shot.csv')
+        record_in_thread(os.ttyname(slave), output, duration=5, count=len(expected))
+    finally:
+        os.close(slave)
+        os.close(master)
+    assert read_rows(output) == expected
+    # Sample 3 arrived damaged; 3 and 5 show as gaps in the sequence.
+    assert '5 samples, 2 dropped, 1 damaged' in capsys.readouterr().err
+
+
+def test_record_stops_at_end_of_file(tmp_path, capsys):
+    stream_path = str(tmp_path / 'stream.bin')
+    fd = os.open(stream_path, os.O_WRONLY | os.O_CREAT)
+    expected = send_session(PtyPort(fd))
+    os.close(fd)
+    output = str(tmp_path / 'shot.csv')
+    record_in_thread(stream_path, output)
+    assert read_rows(output) == expected
+    assert '5 samples, 2 dropped, 1 damaged' in capsys.readouterr().err
@@ -0,0 +1,65 @@
+"""
+Benchmark MPCController against PIDController on a simulated FOPDT boiler
+(see sim_step.py): compute time per update on the host, and the tracking
+error of a warm-up from cold to the set point, with the plant matching the
+MPC's model and with it 20% off in gain and time constant. The PID is
+sim_step's: conditional anti-windup, integral clamp wide open.
+
+    python3 tools/bench_mpc.py
+"""
+
+import time
+
+import sim_step
+from sim_step import PERIOD, SET_TEMP, Plant
+from Espyresso.lib.MPC import FOPDT, MPCController
+
+SECONDS = 1800
+
+
+def make_mpc():
+    return MPCController(set_temp=SET_TEMP, period=PERIOD)
+
+
+class Timed(object):
+    # Wraps a controller, timing its update() calls only.
+    def __init__(self, controller):
+        self.controller = controller
+        self.elapsed = 0.0
+        self.calls = 0
+
+    def update(self, current_temp, dt=None):
+        start = time.perf_counter()
+        output = self.controller.update(current_temp, dt)
+        self.elapsed += time.perf_counter() - start
+        self.calls += 1
+        return output
+
+
+def tracking_error(temps):
+    """
+    Integrated absolute error (degree seconds) over the whole run, and the
+    RMS error over its second half, once warm.
+    """
+    dt = PERIOD / 1000
+    iae = sum(abs(temp - SET_TEMP) for temp in temps) * dt
+    warm = temps[len(temps) // 2:]
+    rms = (sum((temp - SET_TEMP) ** 2 for temp in warm) / len(warm)) ** 0.5
+    return iae, rms
+
+
+def main():
+    plants = (('model', FOPDT()),
+              ('mismatch', FOPDT(gain=2.0, tau=360.0)))
+    print('%-4s %-9s %9s %11s %10s %9s' % ('', 'plant', 'us/step', 'IAE (C s)', 'RMS warm', 'overshoot'))
+    for name, make in (('PID', sim_step.make_pid), ('MPC', make_mpc)):
+        for plant_name, model in plants:
+            timed = Timed(make())
+            temps = sim_step.run(timed, SECONDS, Plant(model))
+            iae, rms = tracking_error(temps)
+            print('%-4s %-9s %9.1f %11.0f %9.2fC %8.1fC' % (name, plant_name, timed.elapsed / timed.calls * 1e6,
+                                                           iae, rms, sim_step.overshoot(temps)))
+
+
+if __name__ == '__main__':
+    main()
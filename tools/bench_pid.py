@@ -0,0 +1,90 @@
+"""
+Benchmark PIDController.update, float against fixed point (Q8): updates
+per second, and heap allocations per update.
+
+    python3 tools/bench_pid.py          (host)
+    micropython tools/bench_pid.py      (unix port, with Espyresso on the path)
+
+or import it on the board and call main(). Allocations are counted with
+gc.mem_alloc(), so they are only reported under MicroPython. On CPython
+the fixed point run instead checks that every value it produces fits a
+MicroPython small int (31 bits), i.e. that none of them would need a
+heap allocated long int on the board.
+"""
+
+import gc
+import sys
+import time
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+SMALL_INT = 1 << 30
+
+if MICROPYTHON:
+    def now_us():
+        return time.ticks_us()
+
+    def elapsed_us(start):
+        return time.ticks_diff(time.ticks_us(), start)
+else:
+    import hostenv
+
+    hostenv.install()
+
+    def now_us():
+        return time.perf_counter()
+
+    def elapsed_us(start):
+        return (time.perf_counter() - start) * 1e6
+
+from Espyresso.lib.PID import PIDController, to_fixed  # noqa: E402
+
+DT = 200000  # us, one nominal period
+
+
+def temps(n, fixed):
+    # A boiler wandering around the set point, precomputed so the loop
+    # below only measures update().
+    result = []
+    for k in range(n):
+        temp = 200 + ((k * 37) % 200 - 100) / 10
+        result.append(to_fixed(temp) if fixed else temp)
+    return result
+
+
+def bench(fixed, n):
+    pid = PIDController(p=2.0, i=0.05, d=1.0, set_temp=200, fixed=fixed, d_on_measurement=True)
+    samples = temps(n, fixed)
+    largest = 0
+    if not MICROPYTHON and fixed:
+        # Range check pass (not timed)
+        for temp in samples:
+            out = pid.update(temp, DT)
+            for value in (out, pid.int, pid.dev, pid.error, pid.p_term, pid.i_term, pid.d_term):
+                largest = max(largest, abs(value))
+        pid.reset()
+
+    gc.collect()
+    gc.disable()
+    before = gc.mem_alloc() if MICROPYTHON else 0
+    start = now_us()
+    for temp in samples:
+        pid.update(temp, DT)
+    us = elapsed_us(start)
+    allocated = gc.mem_alloc() - before if MICROPYTHON else None
+    gc.enable()
+    return n / us * 1e6, allocated, largest
+
+
+def main(n=2000):
+    for fixed in (False, True):
+        rate, allocated, largest = bench(fixed, n)
+        line = '%-5s %8d updates/s' % ('fixed' if fixed else 'float', int(rate))
+        if allocated is not None:
+            line += '  %.2f bytes allocated/update' % (allocated / n)
+        elif fixed:
+            line += '  largest value %d (%s small int range)' % (largest, 'within' if largest < SMALL_INT else 'OUTSIDE')
+        print(line)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Host benchmark for Display.draw_text: the glyph strip fast path against
+the per-pixel renderer it replaced (_draw_text_pixels), on the text of
+the main screen. Checks that both draw the same pixels first.
+
+    python3 tools/bench_text.py [frames]
+"""
+
+import sys
+import time
+
+import hostenv
+
+hostenv.install()
+
+from Espyresso.lib.ssd1306 import Display  # noqa: E402
+
+# The main screen's text: (x, y, string, size)
+FRAME = ((0, 0, 'Temp:', 2), (60, 0, '201.3', 2), (0, 30, 'Set:', 3), (65, 30, '200', 3))
+
+
+def render(display, draw):
+    display.device.fill()
+    for x, y, string, size in FRAME:
+        draw(x, y, string, size, 1, display.device.font)
+
+
+def bench(display, draw, frames):
+    start = time.perf_counter()
+    for _ in range(frames):
+        render(display, draw)
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    display = Display(pinout={'sda': 'Y10', 'scl': 'Y9'}, height=64, external_vcc=False)
+
+    render(display, display._draw_text_pixels)
+    expected = bytes(display.device.buffer)
+    render(display, display.draw_text)
+    if bytes(display.device.buffer) != expected:
+        sys.exit('draw_text and _draw_text_pixels disagree')
+
+    # Warm the glyph strip cache, as after the first frame on the board.
+    render(display, display.draw_text)
+    pixels = bench(display, display._draw_text_pixels, frames)
+    strips = bench(display, display.draw_text, frames)
+    print('per pixel   %.3f ms/frame' % pixels)
+    print('glyph strip %.3f ms/frame' % strips)
+    print('speed-up    %.1fx' % (pixels / strips))
+
+
+if __name__ == '__main__':
+    main()
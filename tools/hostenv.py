@@ -0,0 +1,208 @@
+"""
+Run the firmware modules on a host (CPython) for tests and benchmarks.
+
+install() registers stand-ins for the board only modules (pyb,
+micropython, stm), adds the MicroPython time.ticks_* functions, and maps
+the Espyresso package onto this checkout, so that
+
+>>> import hostenv
+>>> hostenv.install()
+>>> from Espyresso.lib.PID import PIDController
+
+works as on the board. Time is simulated: pyb.micros()/millis() and the
+time.ticks_* functions only move on pyb.udelay(), pyb.delay() and
+advance(), so slot timings come out exact. The peripherals record what
+they are sent and tests can replace or subclass them.
+"""
+
+import os
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Simulated time in us
+clock = [0]
+
+
+def advance(us):
+    clock[0] += int(us)
+
+
+def _micros():
+    return clock[0] & 0x3FFFFFFF
+
+
+def _millis():
+    return (clock[0] // 1000) & 0x3FFFFFFF
+
+
+class Pin(object):
+    IN = 0
+    OUT_PP = 1
+    OUT_OD = 2
+    PULL_NONE = 0
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, name=None, mode=None, pull=None):
+        self.name = name
+        self.level = 1
+
+    def init(self, mode=None, pull=None):
+        pass
+
+    def value(self, *level):
+        if level:
+            self.level = level[0]
+        return self.level
+
+    def high(self):
+        self.level = 1
+
+    def low(self):
+        self.level = 0
+
+
+class I2C(object):
+    """
+    Records every transfer; `nbytes` counts the bytes put on the bus.
+    """
+    MASTER = 0
+
+    def __init__(self, bus=1):
+        self.sent = []
+        self.nbytes = 0
+
+    def init(self, *args, **kwargs):
+        pass
+
+    def is_ready(self, addr):
+        return True
+
+    def send(self, buf, addr=None, timeout=None):
+        data = bytes([buf]) if isinstance(buf, int) else bytes(buf)
+        self.sent.append(data)
+        self.nbytes += len(data)
+
+
+class SPI(I2C):
+    MASTER = 0
+
+    def __init__(self, bus=2, *args, **kwargs):
+        I2C.__init__(self, bus)
+
+
+class UART(object):
+    """
+    A UART with nothing attached: reads return no data.
+    """
+    def __init__(self, bus):
+        self.bus = bus
+        self.baudrate = None
+        self.written = []
+
+    def init(self, baudrate, **kwargs):
+        self.baudrate = baudrate
+
+    def deinit(self):
+        pass
+
+    def any(self):
+        return 0
+
+    def read(self, n=None):
+        return None
+
+    def readinto(self, buf, n=None):
+        return None
+
+    def write(self, buf):
+        self.written.append((self.baudrate, bytes(buf)))
+        return len(buf)
+
+
+class Timer(object):
+    def __init__(self, n, freq=None):
+        self.n = n
+        self.freq = freq
+        self.fn = None
+
+    def callback(self, fn):
+        self.fn = fn
+
+    def deinit(self):
+        self.fn = None
+
+    def fire(self):
+        if self.fn:
+            self.fn(self)
+
+
+class USB_VCP(object):
+    def __init__(self):
+        self.written = bytearray()
+
+    def isconnected(self):
+        return True
+
+    def send(self, data, timeout=5000):
+        self.written += data
+        return len(data)
+
+
+class ExtInt(object):
+    IRQ_FALLING = 0
+    IRQ_RISING = 1
+
+    def __init__(self, pin, mode, pull, callback):
+        self.callback = callback
+
+
+def _wfi():
+    advance(1000)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    sys.modules[name] = module
+    return module
+
+
+def install():
+    if 'pyb' in sys.modules:
+        return
+    _module('pyb',
+            micros=_micros,
+            millis=_millis,
+            elapsed_micros=lambda start: (_micros() - start) & 0x3FFFFFFF,
+            elapsed_millis=lambda start: (_millis() - start) & 0x3FFFFFFF,
+            udelay=advance,
+            delay=lambda ms: advance(ms * 1000),
+            disable_irq=lambda: 0,
+            enable_irq=lambda state: None,
+            wfi=_wfi,
+            Pin=Pin, I2C=I2C, SPI=SPI, UART=UART, Timer=Timer, USB_VCP=USB_VCP, ExtInt=ExtInt,
+            RTC=lambda: None)
+    # No code emitters here: viper and native functions run as plain Python.
+    _module('micropython',
+            native=lambda fn: fn,
+            const=lambda value: value,
+            schedule=lambda fn, arg: fn(arg),
+            alloc_emergency_exception_buf=lambda size: None)
+
+    class Mem32(dict):
+        def __missing__(self, addr):
+            return 0
+
+    _module('stm', mem32=Mem32(), PWR=0x40007000, PWR_CR=0x00, RTC=0x40002800, RTC_BKP0R=0x50)
+
+    time.ticks_ms = _millis
+    time.ticks_us = _micros
+    time.ticks_diff = lambda a, b: ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+    time.ticks_add = lambda a, b: (a + b) & 0x3FFFFFFF
+
+    package = _module('Espyresso')
+    package.__path__ = [ROOT]
@@ -0,0 +1,97 @@
+"""
+Simulated warm-up from cold: PIDController driving a first order plus
+dead time boiler (lib/MPC.py's FOPDT, default parameters) from ambient to
+the set point, once per anti-windup mode. Reports overshoot and settling
+time for each:
+
+    python3 tools/sim_step.py
+"""
+
+import math
+import sys
+
+if sys.implementation.name != 'micropython':
+    import hostenv
+
+    hostenv.install()
+
+from Espyresso.lib.MPC import FOPDT  # noqa: E402
+from Espyresso.lib.PID import PIDController  # noqa: E402
+
+PERIOD = 200  # ms
+SET_TEMP = 200
+BAND = 1.0  # settled once within this many degrees for good
+MODES = (None, 'conditional', 'back')
+
+
+class Plant(object):
+    """
+    FOPDT model stepped exactly over one period, with the heater output
+    (0-100%) reaching the boiler dead_time later.
+    """
+    def __init__(self, model=None, period=PERIOD):
+        self.model = model or FOPDT()
+        dt = period / 1000
+        self.a = math.exp(-dt / self.model.tau)
+        self.in_flight = [0.0] * int(round(self.model.dead_time / dt))
+        self.temp = self.model.ambient
+
+    def step(self, output):
+        self.in_flight.append(output)
+        u = self.in_flight.pop(0)
+        model = self.model
+        self.temp = self.a * self.temp + (1 - self.a) * (model.gain * u + model.ambient)
+        return self.temp
+
+
+def run(controller, seconds=1800, plant=None):
+    """
+    Close the loop for `seconds`; returns the temperature after every period.
+    """
+    plant = plant or Plant()
+    temps = []
+    temp = plant.temp
+    for k in range(int(seconds * 1000 / PERIOD)):
+        temp = plant.step(controller.update(temp, PERIOD * 1000))
+        temps.append(temp)
+    return temps
+
+
+def overshoot(temps, set_temp=SET_TEMP):
+    return max(0.0, max(temps) - set_temp)
+
+
+def settling_time(temps, set_temp=SET_TEMP, band=BAND):
+    """
+    Seconds until the temperature stays within band of the set point, or
+    None if it never does.
+    """
+    for k in range(len(temps) - 1, -1, -1):
+        if abs(temps[k] - set_temp) > band:
+            if k == len(temps) - 1:
+                return None
+            return (k + 1) * PERIOD / 1000
+    return 0.0
+
+
+def make_pid(anti_windup='conditional'):
+    # Integral clamp wide open, so it doesn't stand in for anti-windup.
+    return PIDController(p=2.0, i=0.05, d=1.0, set_temp=SET_TEMP, period=PERIOD, i_max=1e6, i_min=-1e6,
+                         anti_windup=anti_windup, d_on_measurement=True)
+
+
+def step_response(anti_windup, seconds=1800):
+    return run(make_pid(anti_windup), seconds)
+
+
+def main():
+    print('%-12s %10s %10s' % ('anti-windup', 'overshoot', 'settling'))
+    for mode in MODES:
+        temps = step_response(mode)
+        settled = settling_time(temps)
+        print('%-12s %9.1fC %10s' % (mode, overshoot(temps),
+                                      'never' if settled is None else '%.0fs' % settled))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Record the Pyboard's binary telemetry stream (see lib/telemetry.py) on a
+host, to CSV or to a NumPy .npy file:
+
+    python3 tools/telemetry_recorder.py /dev/ttyACM0 shot.csv
+    python3 tools/telemetry_recorder.py /dev/ttyACM0 shot.npy --duration 60
+
+Runs until interrupted (Ctrl-C), or for --duration seconds / --count
+samples; given a plain file instead of a port, up to its end. Needs
+nothing beyond the standard library, except numpy for .npy output. The
+port can be any serial device or pty; the stream is decoded from raw
+bytes, resyncing on the frame marker whenever a frame is cut short or
+fails its CRC (e.g. text printed by the board in between).
+"""
+
+import argparse
+import csv
+import errno
+import os
+import struct
+import sys
+import time
+
+# Must match lib/telemetry.py
+FIELDS = ('temp', 'set_point', 'p', 'i', 'd', 'output', 'duty', 'feed_forward')
+SAMPLE_FORMAT = '<I8fB'
+SYNC = b'\xaa\x55'
+SAMPLE_BYTES = struct.calcsize(SAMPLE_FORMAT)
+FRAME_BYTES = len(SYNC) + 1 + SAMPLE_BYTES + 1
+COLUMNS = ('time',) + FIELDS + ('flags',)
+
+
+def crc8(data):
+    # Dallas/Maxim CRC8, as lib/onewire.py
+    crc = 0
+    for byte in data:
+        for bit in range(8):
+            mix = (crc ^ byte) & 1
+            crc >>= 1
+            if mix:
+                crc ^= 0x8C
+            byte >>= 1
+    return crc
+
+
+class FrameDecoder(object):
+    """
+    Turn chunks of the byte stream into samples: tuples of COLUMNS.
+    `dropped` counts frames the board skipped (from gaps in the sequence
+    numbers) and `errors` frames that arrived damaged.
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+        self.seq = None
+        self.dropped = 0
+        self.errors = 0
+
+    def feed(self, data):
+        self.buffer += data
+        samples = []
+        while True:
+            start = self.buffer.find(SYNC)
+            if start < 0:
+                # Keep a trailing first sync byte; it may start a frame.
+                del self.buffer[:max(0, len(self.buffer) - 1)]
+                break
+            del self.buffer[:start]
+            if len(self.buffer) < FRAME_BYTES:
+                break
+            frame = bytes(self.buffer[:FRAME_BYTES])
+            if crc8(frame[2:]) != 0:
+                # Not a frame after all; look for the next marker.
+                self.errors += 1
+                del self.buffer[:1]
+                continue
+            del self.buffer[:FRAME_BYTES]
+            seq = frame[2]
+            if self.seq is not None:
+                self.dropped += (seq - self.seq - 1) & 0xFF
+            self.seq = seq
+            samples.append(struct.unpack_from(SAMPLE_FORMAT, frame, 3))
+        return samples
+
+
+def open_port(path):
+    fd = os.open(path, os.O_RDONLY | os.O_NOCTTY)
+    if os.isatty(fd):
+        import termios
+        import tty
+        # TCSANOW: keep whatever the board sent before the port was opened
+        tty.setraw(fd, termios.TCSANOW)
+        # Return whatever has arrived, waiting at most 0.1 s.
+        attrs = termios.tcgetattr(fd)
+        attrs[6][termios.VMIN] = 0
+        attrs[6][termios.VTIME] = 1
+        termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    return fd
+
+
+class CSVWriter(object):
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, samples):
+        self.writer.writerows(samples)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class NumpyWriter(object):
+    # Samples are kept in memory and saved as a structured array at the end.
+    def __init__(self, path):
+        import numpy
+        self.numpy = numpy
+        self.path = path
+        self.samples = []
+
+    def write(self, samples):
+        self.samples.extend(samples)
+
+    def close(self):
+        dtype = [('time', 'u4')] + [(name, 'f4') for name in FIELDS] + [('flags', 'u1')]
+        self.numpy.save(self.path, self.numpy.array(self.samples, dtype=dtype))
+
+
+def record(port, output, duration=None, count=None):
+    writer = NumpyWriter(output) if output.endswith('.npy') else CSVWriter(output)
+    fd = open_port(port)
+    decoder = FrameDecoder()
+    total = 0
+    end = None if duration is None else time.time() + duration
+    try:
+        while (end is None or time.time() < end) and (count is None or total < count):
+            try:
+                data = os.read(fd, 4096)
+            except OSError as e:
+                # EIO: the board was unplugged, or the pty's other end closed.
+                if e.errno == errno.EIO:
+                    break
+                raise
+            if not data:
+                # A tty just had nothing within VTIME; anything else is at EOF.
+                if os.isatty(fd):
+                    continue
+                break
+            samples = decoder.feed(data)
+            if count is not None:
+                samples = samples[:count - total]
+            writer.write(samples)
+            total += len(samples)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        os.close(fd)
+    print('%d samples, %d dropped, %d damaged' % (total, decoder.dropped, decoder.errors), file=sys.stderr)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record Espyresso telemetry to CSV or .npy')
+    parser.add_argument('port', help='serial device, e.g. /dev/ttyACM0')
+    parser.add_argument('output', help='output file; .npy for NumPy, anything else for CSV')
+    parser.add_argument('--duration', type=float, help='stop after this many seconds')
+    parser.add_argument('--count', type=int, help='stop after this many samples')
+    args = parser.parse_args()
+    try:
+        record(args.port, args.output, args.duration, args.count)
+    except ImportError:
+        parser.error('numpy is needed for .npy output')
+
+
+if __name__ == '__main__':
+    main()